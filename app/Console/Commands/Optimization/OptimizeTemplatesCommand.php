@@ -3,6 +3,7 @@
 namespace App\Console\Commands\Optimization;
 
 use App\Jobs\Zabbix\OptimizeTemplatesJob;
+use App\Models\BackgroundJob;
 use App\Models\ZabbixConnection;
 use App\Models\ZabbixTemplate;
 use App\Services\Zabbix\TemplateOptimizationService;
@@ -16,12 +17,17 @@ class OptimizeTemplatesCommand extends Command
                             {--all : Optimize all templates that need optimization}
                             {--auto : Use auto-optimization via MCP server}
                             {--queue : Run optimization in background queue}
+                            {--shards=1 : Split the queued batch into N jobs partitioned by template ID hash}
                             {--force : Force optimization even if already optimized}';
 
     protected $description = 'Optimize Zabbix templates';
 
     public function handle(): int
     {
+        if (! $this->validateShardsOption()) {
+            return self::FAILURE;
+        }
+
         $connection = $this->getConnection();
         if (! $connection) {
             return self::FAILURE;
@@ -63,8 +69,32 @@ private function optimizeAllTemplates(ZabbixConnection $connection): int
         $this->newLine();
 
         if ($this->option('queue')) {
-            OptimizeTemplatesJob::dispatch($connection, null, false);
-            $this->info('✓ Optimization job queued successfully!');
+            $shards = (int) $this->option('shards');
+
+            if ($shards === 1) {
+                OptimizeTemplatesJob::dispatch($connection, null, false);
+                $this->info('✓ Optimization job queued successfully!');
+
+                return self::SUCCESS;
+            }
+
+            // The parent job collects the shard results into one report
+            $parentJob = BackgroundJob::create([
+                'job_type' => 'optimize_all_templates_sharded',
+                'zabbix_connection_id' => $connection->id,
+                'parameters' => [
+                    'connection_name' => $connection->name,
+                    'shard_count' => $shards,
+                ],
+                'status' => 'pending',
+                'progress_percentage' => 0,
+            ]);
+
+            for ($shard = 0; $shard < $shards; $shard++) {
+                OptimizeTemplatesJob::dispatch($connection, null, false, $shard, $shards, $parentJob->id);
+            }
+            $this->info("✓ {$shards} optimization jobs queued successfully!");
+            $this->line("Combined results: background job #{$parentJob->id}");
 
             return self::SUCCESS;
         }
@@ -72,6 +102,36 @@ private function optimizeAllTemplates(ZabbixConnection $connection): int
         return $this->optimizeTemplatesBatch($connection, $templates);
     }
 
+    private function validateShardsOption(): bool
+    {
+        $value = $this->option('shards');
+        $shards = is_numeric($value) ? (int) $value : 0;
+
+        if ($shards < 1 || (string) $shards !== (string) $value) {
+            $this->error('The --shards option must be a positive integer.');
+
+            return false;
+        }
+
+        if ($shards === 1) {
+            return true;
+        }
+
+        if ($this->option('auto')) {
+            $this->error('The --shards option cannot be combined with --auto.');
+
+            return false;
+        }
+
+        if (! $this->option('all') || ! $this->option('queue')) {
+            $this->error('The --shards option requires --all and --queue.');
+
+            return false;
+        }
+
+        return true;
+    }
+
     private function autoOptimizeAll(ZabbixConnection $connection): int
     {
         $this->info('Running auto-optimization via MCP server...');
@@ -12,6 +12,7 @@
 use Illuminate\Foundation\Bus\Dispatchable;
 use Illuminate\Queue\InteractsWithQueue;
 use Illuminate\Queue\SerializesModels;
+use Illuminate\Support\Facades\DB;
 use Illuminate\Support\Facades\Log;
 
 class OptimizeTemplatesJob implements ShouldQueue
@@ -32,17 +33,34 @@ class OptimizeTemplatesJob implements ShouldQueue
 
     private bool $autoOptimize;
 
+    private ?int $shardIndex;
+
+    private int $shardCount;
+
+    private ?int $parentJobId;
+
     /**
      * Create a new job instance.
+     *
+     * When a shard is given, the batch only processes templates whose
+     * crc32(template_id) % $shardCount equals $shardIndex, so N jobs can
+     * split one connection without overlapping. Each shard adds its result to
+     * the parent background job, which holds the combined report.
      */
     public function __construct(
         ZabbixConnection $connection,
         ?ZabbixTemplate $template = null,
-        bool $autoOptimize = false
+        bool $autoOptimize = false,
+        ?int $shardIndex = null,
+        int $shardCount = 1,
+        ?int $parentJobId = null
     ) {
         $this->connection = $connection;
         $this->template = $template;
         $this->autoOptimize = $autoOptimize;
+        $this->shardIndex = $shardIndex;
+        $this->shardCount = max(1, $shardCount);
+        $this->parentJobId = $parentJobId;
         $queueName = config('zabbix.jobs.queue', 'default');
         $this->onQueue(is_string($queueName) ? $queueName : 'default');
     }
@@ -60,6 +78,9 @@ public function handle(): void
                 'template_id' => $this->template?->template_id,
                 'template_name' => $this->template?->name,
                 'auto_optimize' => $this->autoOptimize,
+                'shard_index' => $this->shardIndex,
+                'shard_count' => $this->shardCount,
+                'parent_job_id' => $this->parentJobId,
             ],
             'status' => 'running',
             'progress_percentage' => 0,
@@ -167,6 +188,12 @@ private function optimizeAllTemplates(TemplateOptimizationService $service): voi
                 ->needsOptimization()
                 ->get();
 
+            if ($this->shardIndex !== null) {
+                $templates = $templates
+                    ->filter(fn (ZabbixTemplate $template): bool => $this->belongsToShard($template))
+                    ->values();
+            }
+
             $totalTemplates = $templates->count();
             $optimized = 0;
             $errors = 0;
@@ -195,6 +222,14 @@ private function optimizeAllTemplates(TemplateOptimizationService $service): voi
 
             $this->backgroundJob->markAsCompleted([
                 'optimization_type' => 'batch',
+                'shard_index' => $this->shardIndex,
+                'shard_count' => $this->shardCount,
+                'total_templates' => $totalTemplates,
+                'optimized' => $optimized,
+                'errors' => $errors,
+            ]);
+
+            $this->mergeIntoParentJob([
                 'total_templates' => $totalTemplates,
                 'optimized' => $optimized,
                 'errors' => $errors,
@@ -210,6 +245,88 @@ private function optimizeAllTemplates(TemplateOptimizationService $service): voi
         }
     }
 
+    /**
+     * Add this shard's result to the parent job and complete it once every shard has reported
+     *
+     * Results are keyed by shard index, so a retried shard replaces its
+     * previous result instead of being counted twice.
+     *
+     * @param  array<string, mixed>  $shardResult
+     */
+    private function mergeIntoParentJob(array $shardResult): void
+    {
+        if ($this->parentJobId === null || $this->shardIndex === null) {
+            return;
+        }
+
+        DB::transaction(function () use ($shardResult): void {
+            $parent = BackgroundJob::lockForUpdate()->find($this->parentJobId);
+            if (! $parent) {
+                return;
+            }
+
+            $previous = is_array($parent->result_data) ? $parent->result_data : [];
+            $shards = is_array($previous['shards'] ?? null) ? $previous['shards'] : [];
+            $shards[(string) $this->shardIndex] = $shardResult;
+
+            $failedShards = count(array_filter($shards, fn ($result): bool => isset($result['error'])));
+            $merged = [
+                'optimization_type' => 'batch',
+                'shard_count' => $this->shardCount,
+                'shards_reported' => count($shards),
+                'failed_shards' => $failedShards,
+                'total_templates' => array_sum(array_column($shards, 'total_templates')),
+                'optimized' => array_sum(array_column($shards, 'optimized')),
+                'errors' => array_sum(array_column($shards, 'errors')),
+                'shards' => $shards,
+            ];
+
+            if (count($shards) < $this->shardCount) {
+                $parent->update([
+                    'status' => 'running',
+                    'started_at' => $parent->started_at ?? now(),
+                    'progress_percentage' => intdiv(100 * count($shards), $this->shardCount),
+                    'result_data' => $merged,
+                ]);
+
+                return;
+            }
+
+            $parent->markAsCompleted($merged);
+            if ($failedShards > 0) {
+                $parent->markAsFailed("{$failedShards} of {$this->shardCount} shards failed");
+            }
+        });
+    }
+
+    /**
+     * Check whether a template belongs to this job's shard
+     */
+    public function belongsToShard(ZabbixTemplate $template): bool
+    {
+        if ($this->shardIndex === null) {
+            return true;
+        }
+
+        return crc32((string) $template->template_id) % $this->shardCount === $this->shardIndex;
+    }
+
+    /**
+     * Get the shard this job processes (null when not sharded)
+     */
+    public function getShardIndex(): ?int
+    {
+        return $this->shardIndex;
+    }
+
+    /**
+     * Get the total number of shards the batch was split into
+     */
+    public function getShardCount(): int
+    {
+        return $this->shardCount;
+    }
+
     /**
      * Handle a job failure.
      */
@@ -219,6 +336,13 @@ public function failed(Exception $exception): void
             $this->backgroundJob->markAsFailed($exception->getMessage());
         }
 
+        $this->mergeIntoParentJob([
+            'total_templates' => 0,
+            'optimized' => 0,
+            'errors' => 0,
+            'error' => $exception->getMessage(),
+        ]);
+
         Log::error('Template optimization job failed permanently', [
             'connection_id' => $this->connection->id,
             'template_id' => $this->template?->template_id,
@@ -0,0 +1,237 @@
+"""
+Almacén columnar (Parquet) con el histórico de ejecuciones del analizador.
+
+Cada ejecución de analyze_template_history_trends.py con --store añade dos
+ficheros Parquet particionados por instancia:
+
+- templates/: una fila por template (instancia, fecha, template, contadores),
+  escrita por lotes según avanza el análisis
+- values/: distribución de valores de history/trends de la ejecución
+
+Las consultas (query_template_history_trends.py) leen solo las columnas y
+particiones necesarias con pyarrow.dataset y agregan con pyarrow.compute, sin
+volver a llamar a la API.
+"""
+
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+TEMPLATES_SCHEMA_FIELDS = [
+    ('instance', 'string'),
+    ('run_at', 'timestamp'),
+    ('run_id', 'string'),
+    ('templateid', 'string'),
+    ('name', 'string'),
+    ('total_items', 'int64'),
+    ('long_history_items', 'int64'),
+    ('long_trends_items', 'int64'),
+    ('estimated_bytes', 'int64'),
+    ('hosts', 'int64')
+]
+
+VALUES_SCHEMA_FIELDS = [
+    ('instance', 'string'),
+    ('run_at', 'timestamp'),
+    ('run_id', 'string'),
+    ('kind', 'string'),
+    ('value', 'string'),
+    ('count', 'int64')
+]
+
+# Filas por lote al escribir la tabla templates
+WRITE_BATCH_SIZE = 10000
+
+def require_pyarrow():
+    """Comprueba que pyarrow está instalado"""
+    if pa is None:
+        raise RuntimeError("pyarrow no está instalado, necesario para el almacén columnar")
+
+def build_schema(fields):
+    """Construye un esquema de pyarrow a partir de (nombre, tipo)"""
+    types = {
+        'string': pa.string(),
+        'int64': pa.int64(),
+        'timestamp': pa.timestamp('s', tz='UTC')
+    }
+    return pa.schema([(name, types[kind]) for name, kind in fields])
+
+def instance_partition(instance):
+    """Nombre de directorio seguro para la partición de una instancia"""
+    return re.sub(r'[^A-Za-z0-9._-]', '_', instance)
+
+class StoreRunWriter:
+    """Escribe una ejecución en el almacén template a template, por lotes
+
+    Los ficheros se escriben con un nombre oculto y se renombran al cerrar, así
+    las consultas nunca ven una ejecución a medias. Varias escrituras (ej: los
+    shards de un mismo análisis) pueden compartir run_id.
+    """
+
+    def __init__(self, store_dir, instance, run_at=None, run_id=None):
+        require_pyarrow()
+        self.store_dir = store_dir
+        self.instance = instance
+        self.run_at = run_at or datetime.now(timezone.utc).replace(microsecond=0)
+        # Sufijo aleatorio: dos ejecuciones en el mismo segundo no se pisan
+        file_id = f"{self.run_at.strftime('%Y%m%dT%H%M%SZ')}-{uuid.uuid4().hex[:8]}"
+        self.run_id = run_id or file_id
+        self.filename = f"run-{file_id}.parquet"
+        self.schema = build_schema(TEMPLATES_SCHEMA_FIELDS)
+        self.rows = []
+        self.writer = None
+
+    def _paths(self, table_name):
+        """Rutas temporal y final del fichero de una tabla"""
+        directory = os.path.join(self.store_dir, table_name, f"instance={instance_partition(self.instance)}")
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f".{self.filename}.tmp"), os.path.join(directory, self.filename)
+
+    def add_template(self, template_stats):
+        """Añade el resumen de un template a la ejecución"""
+        self.rows.append({
+            'instance': self.instance,
+            'run_at': self.run_at,
+            'run_id': self.run_id,
+            'templateid': str(template_stats['templateid']),
+            'name': template_stats['name'],
+            'total_items': template_stats['total_items'],
+            'long_history_items': template_stats['long_history_items'],
+            'long_trends_items': template_stats['long_trends_items'],
+            'estimated_bytes': template_stats.get('estimated_bytes'),
+            'hosts': template_stats.get('hosts')
+        })
+
+        if len(self.rows) >= WRITE_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        """Escribe las filas pendientes como un row group"""
+        if self.writer is None:
+            self.tmp_path, self.path = self._paths('templates')
+            self.writer = pq.ParquetWriter(self.tmp_path, self.schema)
+
+        self.writer.write_table(pa.Table.from_pylist(self.rows, schema=self.schema))
+        self.rows = []
+
+    def close(self, stats):
+        """Cierra la ejecución y escribe la distribución de valores"""
+        self._flush()
+        self.writer.close()
+        os.replace(self.tmp_path, self.path)
+
+        value_rows = [('history', value, count) for value, count in stats['history_values'].items()]
+        value_rows += [('trends', value, count) for value, count in stats['trends_values'].items()]
+        values = pa.table({
+            'instance': [self.instance] * len(value_rows),
+            'run_at': [self.run_at] * len(value_rows),
+            'run_id': [self.run_id] * len(value_rows),
+            'kind': [row[0] for row in value_rows],
+            'value': [str(row[1]) for row in value_rows],
+            'count': [row[2] for row in value_rows]
+        }, schema=build_schema(VALUES_SCHEMA_FIELDS))
+
+        tmp_path, path = self._paths('values')
+        pq.write_table(values, tmp_path)
+        os.replace(tmp_path, path)
+
+        return self.run_at
+
+def open_table(store_dir, table_name, instance=None):
+    """Abre una de las tablas del almacén como dataset de pyarrow
+
+    Con instance solo se abre el directorio de su partición: así se podan los
+    ficheros del resto de instancias. La columna instance ya va en los ficheros
+    (el nombre del directorio está saneado), por eso no se usa partitioning.
+    """
+    require_pyarrow()
+    fields = TEMPLATES_SCHEMA_FIELDS if table_name == 'templates' else VALUES_SCHEMA_FIELDS
+    path = os.path.join(store_dir, table_name)
+    if instance:
+        path = os.path.join(path, f"instance={instance_partition(instance)}")
+        if not os.path.isdir(path):
+            return None
+
+    return ds.dataset(
+        path,
+        format='parquet',
+        schema=build_schema(fields),
+        partitioning=None
+    )
+
+def query_template_trend(store_dir, metric, days, instance=None):
+    """Agrega una métrica por template en los últimos días: primera, última, mínima y máxima"""
+    dataset = open_table(store_dir, 'templates', instance)
+    if dataset is None:
+        return []
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+
+    condition = ds.field('run_at') >= pa.scalar(since, type=pa.timestamp('s', tz='UTC'))
+    if instance:
+        condition = condition & (ds.field('instance') == instance)
+
+    table = dataset.to_table(
+        columns=['instance', 'templateid', 'name', 'run_at', metric],
+        filter=condition
+    )
+    if table.num_rows == 0:
+        return []
+
+    # Ordenar por fecha para que first/last tengan sentido en la agregación
+    table = table.sort_by([('run_at', 'ascending')])
+    grouped = table.group_by(['instance', 'templateid'], use_threads=False).aggregate([
+        ('name', 'last'),
+        (metric, 'first'),
+        (metric, 'last'),
+        (metric, 'min'),
+        (metric, 'max'),
+        ('run_at', 'count'),
+        ('run_at', 'max')
+    ])
+
+    return grouped.sort_by([(f"{metric}_last", 'descending')]).to_pylist()
+
+def query_value_distribution(store_dir, kind, instance=None):
+    """Devuelve la distribución de valores de la última ejecución de cada instancia
+
+    La última ejecución es el run_id de la fila más reciente (desempate por
+    run_id); se suman todas sus filas, así los shards con el mismo run_id dan
+    una sola distribución.
+    """
+    dataset = open_table(store_dir, 'values', instance)
+    if dataset is None:
+        return []
+
+    condition = ds.field('kind') == kind
+    if instance:
+        condition = condition & (ds.field('instance') == instance)
+
+    table = dataset.to_table(filter=condition)
+    if table.num_rows == 0:
+        return []
+
+    # Ficheros anteriores a run_id: cada segundo cuenta como una ejecución
+    run_ids = pc.coalesce(table['run_id'], pc.cast(table['run_at'], pa.string()))
+    table = table.set_column(table.schema.get_field_index('run_id'), 'run_id', run_ids)
+
+    latest_at = table.group_by('instance').aggregate([('run_at', 'max')])
+    candidates = table.join(latest_at, keys='instance')
+    candidates = candidates.filter(pc.equal(candidates['run_at'], candidates['run_at_max']))
+    latest_run = candidates.group_by('instance').aggregate([('run_id', 'max')])
+
+    table = table.join(latest_run, keys='instance')
+    table = table.filter(pc.equal(table['run_id'], table['run_id_max']))
+    grouped = table.group_by(['instance', 'value']).aggregate([('count', 'sum'), ('run_at', 'max')])
+    renames = {'count_sum': 'count', 'run_at_max': 'run_at'}
+    grouped = grouped.rename_columns([renames.get(name, name) for name in grouped.column_names])
+
+    return grouped.select(['instance', 'run_at', 'value', 'count']).sort_by('value').to_pylist()
@@ -3,11 +3,27 @@
 Script para analizar los valores de History y Trends en los templates de Zabbix
 """
 
+import argparse
 import json
 import sys
 import os
-from zabbix_utils import ZabbixAPI
+from urllib.parse import urlparse
+from xml.etree import ElementTree
 from dotenv import load_dotenv
+from template_scope import add_scope_arguments, describe_scope, get_template_scope
+from zabbix_stream import ZabbixStreamClient, format_bytes
+from analysis_store import StoreRunWriter
+from retention_aggregation import DEFAULT_TOP_K, RetentionAggregator
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
 
 # Cargar variables de entorno desde .env
 load_dotenv()
@@ -16,142 +32,209 @@ load_dotenv()
 ZABBIX_URL = os.getenv('ZABBIX_URL', 'http://localhost:8080')
 ZABBIX_TOKEN = os.getenv('ZABBIX_TOKEN')
 
+# Comprimir también las peticiones (el servidor web debe aceptar Content-Encoding: gzip)
+ZABBIX_COMPRESS_REQUESTS = os.getenv('ZABBIX_COMPRESS_REQUESTS', '').lower() in ('1', 'true', 'yes')
+
+# Valores que configuration.export omite por ser los de defecto
+EXPORT_DEFAULT_HISTORY = '90d'
+EXPORT_DEFAULT_TRENDS = '365d'
+EXPORT_DEFAULT_DELAY = '1m'
+TEXT_VALUE_TYPES = ('CHAR', 'LOG', 'TEXT')
+
+def positive_int(value):
+    """Entero mayor que 0, para argparse"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"debe ser al menos 1 (recibido {value})")
+    return number
+
 def connect_to_zabbix():
     """Conecta a la API de Zabbix usando token"""
     try:
-        api = ZabbixAPI(url=ZABBIX_URL)
-        api.login(token=ZABBIX_TOKEN)
+        # Todo el tráfico del script pasa por este cliente (gzip/deflate y cuenta de bytes)
+        api = ZabbixStreamClient(ZABBIX_URL, ZABBIX_TOKEN, compress_requests=ZABBIX_COMPRESS_REQUESTS)
         print(f"✅ Conectado a Zabbix API versión: {api.api_version()}")
         return api
     except Exception as e:
         print(f"❌ Error conectando a Zabbix: {e}")
         return None
 
-def parse_time_to_days(time_str):
-    """Convierte string de tiempo a días (ej: '31d' -> 31)"""
-    if not time_str or time_str == '0':
-        return 0
-    
-    time_str = str(time_str).lower()
-    
-    if time_str.endswith('d'):
-        return int(time_str[:-1])
-    elif time_str.endswith('w'):
-        return int(time_str[:-1]) * 7
-    elif time_str.endswith('m'):
-        return int(time_str[:-1]) * 30
-    elif time_str.endswith('y'):
-        return int(time_str[:-1]) * 365
-    elif time_str.endswith('h'):
-        return int(time_str[:-1]) / 24
-    else:
-        # Asumir que es un número de días
-        try:
-            return int(time_str)
-        except:
-            return 0
+def aggregate_templates(templates, top_k=DEFAULT_TOP_K, template_sink=None):
+    """Agrega las estadísticas de History/Trends en una sola pasada sobre los templates
+
+    Los items de cada template se recorren una sola vez, así que pueden ser un
+    generador (modo streaming). template_sink recibe el resumen de cada template.
+    """
+    aggregator = RetentionAggregator(top_k)
+    
+    for template in templates:
+        template_stats = aggregator.add_template(template)
+        if template_sink:
+            template_sink(template_stats)
+    
+    return aggregator
 
-def analyze_templates(api):
+def analyze_templates(api, scope=None, top_k=DEFAULT_TOP_K, template_sink=None):
     """Analiza los templates y sus valores de History/Trends"""
     try:
-        # Obtener todos los templates con sus items
+        # Obtener los templates del alcance con sus items
         templates = api.template.get(
             output=['templateid', 'name'],
-            selectItems=['itemid', 'name', 'key_', 'history', 'trends']
+            selectItems=['itemid', 'name', 'key_', 'history', 'trends', 'delay'],
+            selectHosts='count',
+            **(scope or {})
         )
         
-        stats = {
-            'total_templates': len(templates),
-            'templates_with_long_history': 0,
-            'templates_with_long_trends': 0,
-            'total_items': 0,
-            'items_with_long_history': 0,
-            'items_with_long_trends': 0,
-            'history_values': {},
-            'trends_values': {},
-            'templates_summary': []
-        }
+        return aggregate_templates(templates, top_k, template_sink)
         
-        for template in templates:
-            template_stats = {
-                'name': template['name'],
-                'templateid': template['templateid'],
-                'total_items': len(template.get('items', [])),
-                'long_history_items': 0,
-                'long_trends_items': 0
-            }
-            
-            stats['total_items'] += template_stats['total_items']
-            
-            template_has_long_values = False
-            
-            for item in template.get('items', []):
-                history = item.get('history', '')
-                trends = item.get('trends', '')
-                
-                # Contar valores de history
-                if history in stats['history_values']:
-                    stats['history_values'][history] += 1
-                else:
-                    stats['history_values'][history] = 1
-                
-                # Contar valores de trends
-                if trends in stats['trends_values']:
-                    stats['trends_values'][trends] += 1
-                else:
-                    stats['trends_values'][trends] = 1
-                
-                # Verificar si necesita actualización
-                history_days = parse_time_to_days(history)
-                trends_days = parse_time_to_days(trends)
-                
-                if history_days > 7:
-                    stats['items_with_long_history'] += 1
-                    template_stats['long_history_items'] += 1
-                    template_has_long_values = True
-                
-                if trends_days > 30:
-                    stats['items_with_long_trends'] += 1
-                    template_stats['long_trends_items'] += 1
-                    template_has_long_values = True
-            
-            if template_has_long_values:
-                stats['templates_summary'].append(template_stats)
-                
-                if template_stats['long_history_items'] > 0:
-                    stats['templates_with_long_history'] += 1
-                if template_stats['long_trends_items'] > 0:
-                    stats['templates_with_long_trends'] += 1
+    except Exception as e:
+        print(f"❌ Error analizando templates: {e}")
+        return None
+
+def analyze_templates_stream(api, scope=None, top_k=DEFAULT_TOP_K, template_sink=None):
+    """Analiza los templates decodificando la respuesta de template.get en streaming"""
+    try:
+        templates = api.iter_templates(
+            output=['templateid', 'name'],
+            selectItems=['itemid', 'name', 'key_', 'history', 'trends', 'delay'],
+            selectHosts='count',
+            **(scope or {})
+        )
         
-        return stats
+        return aggregate_templates(templates, top_k, template_sink)
         
     except Exception as e:
         print(f"❌ Error analizando templates: {e}")
         return None
 
-def main():
-    """Función principal"""
-    print("📊 Analizador de History/Trends para Templates de Zabbix")
-    print("=" * 60)
-    
-    if not ZABBIX_TOKEN:
-        print("❌ Error: ZABBIX_TOKEN no está configurado")
-        sys.exit(1)
+def normalize_export_template(template):
+    """Convierte un template de configuration.export al formato de template.get"""
+    items = []
     
-    print(f"🌐 URL: {ZABBIX_URL}")
+    for item in template.get('items') or []:
+        # configuration.export omite los valores por defecto
+        trends = item.get('trends')
+        if trends is None:
+            trends = '0' if item.get('value_type') in TEXT_VALUE_TYPES else EXPORT_DEFAULT_TRENDS
+        
+        items.append({
+            'itemid': item.get('uuid', ''),
+            'name': item.get('name', ''),
+            'key_': item.get('key', ''),
+            'history': item.get('history') or EXPORT_DEFAULT_HISTORY,
+            'trends': trends,
+            'delay': item.get('delay') or EXPORT_DEFAULT_DELAY
+        })
     
-    # Conectar a Zabbix
-    api = connect_to_zabbix()
-    if not api:
-        sys.exit(1)
+    return {
+        'templateid': template.get('uuid') or template.get('template', ''),
+        'name': template.get('name') or template.get('template', ''),
+        'items': items
+    }
+
+def iter_xml_export_templates(path):
+    """Lee los templates de un export XML de forma incremental con iterparse"""
+    tags = []
+    template = None
     
-    # Analizar templates
-    print("\n🔍 Analizando templates...")
-    stats = analyze_templates(api)
+    for event, elem in ElementTree.iterparse(path, events=('start', 'end')):
+        if event == 'start':
+            tags.append(elem.tag)
+            if tags == ['zabbix_export', 'templates', 'template']:
+                template = {'items': []}
+            continue
+        
+        if template is not None:
+            if len(tags) == 4 and len(elem) == 0:
+                template[elem.tag] = elem.text
+            elif tags[3:] == ['items', 'item']:
+                template['items'].append({child.tag: child.text for child in elem if len(child) == 0})
+                elem.clear()
+        
+        if tags == ['zabbix_export', 'templates', 'template']:
+            yield normalize_export_template(template)
+            template = None
+            elem.clear()
+        
+        tags.pop()
+
+def iter_json_export_templates(path):
+    """Lee los templates de un export JSON de forma incremental con ijson"""
+    with open(path, 'rb') as f:
+        if ijson is None:
+            print("⚠️  ijson no está instalado, cargando el export completo en memoria")
+            templates = json.load(f).get('zabbix_export', {}).get('templates', [])
+        else:
+            templates = ijson.items(f, 'zabbix_export.templates.item')
+        
+        for template in templates:
+            yield normalize_export_template(template)
+
+def iter_yaml_export_templates(path):
+    """Lee los templates de un export YAML de forma incremental con eventos de PyYAML"""
+    # Cada nivel guarda [contenedor, key pendiente, ruta]
+    stack = []
     
-    if not stats:
-        sys.exit(1)
+    def add_value(value):
+        if not stack:
+            return
+        frame = stack[-1]
+        if isinstance(frame[0], list):
+            frame[0].append(value)
+        elif frame[1] is None:
+            frame[1] = value
+        else:
+            frame[0][frame[1]] = value
+            frame[1] = None
     
+    with open(path, 'rb') as f:
+        for event in yaml.parse(f):
+            if isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+                if not stack:
+                    path_names = ()
+                elif isinstance(stack[-1][0], list):
+                    path_names = stack[-1][2] + ('item',)
+                else:
+                    path_names = stack[-1][2] + (stack[-1][1],)
+                container = {} if isinstance(event, yaml.MappingStartEvent) else []
+                stack.append([container, None, path_names])
+            elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+                container, _, path_names = stack.pop()
+                if path_names == ('zabbix_export', 'templates', 'item'):
+                    yield normalize_export_template(container)
+                else:
+                    add_value(container)
+            elif isinstance(event, yaml.ScalarEvent):
+                add_value(event.value)
+            elif isinstance(event, yaml.AliasEvent):
+                add_value(None)
+
+def iter_export_templates(paths):
+    """Recorre los templates de varios ficheros de configuration.export"""
+    for path in paths:
+        extension = os.path.splitext(path)[1].lower()
+        
+        if extension == '.xml':
+            yield from iter_xml_export_templates(path)
+        elif extension == '.json':
+            yield from iter_json_export_templates(path)
+        elif extension in ('.yaml', '.yml'):
+            if yaml is None:
+                raise RuntimeError("PyYAML no está instalado, no se pueden leer exports YAML")
+            yield from iter_yaml_export_templates(path)
+        else:
+            raise ValueError(f"Formato de export no soportado: {path}")
+
+def analyze_export_files(paths, top_k=DEFAULT_TOP_K, template_sink=None):
+    """Analiza los templates de ficheros de export sin conectar a la API"""
+    try:
+        return aggregate_templates(iter_export_templates(paths), top_k, template_sink)
+    except Exception as e:
+        print(f"❌ Error analizando exports: {e}")
+        return None
+
+def print_report(stats):
+    """Muestra el informe de History/Trends a partir de las estadísticas"""
     # Mostrar resumen
     print(f"\n📋 RESUMEN GENERAL")
     print(f"   Total de templates: {stats['total_templates']}")
@@ -173,18 +256,36 @@ def main():
         percentage = (count / stats['total_items']) * 100
         print(f"   {value:>6}: {count:>6} items ({percentage:>5.1f}%)")
     
-    # Mostrar templates más problemáticos
-    print(f"\n⚠️  TOP 10 TEMPLATES CON MÁS ITEMS PROBLEMÁTICOS")
-    sorted_templates = sorted(stats['templates_summary'], 
-                             key=lambda x: x['long_history_items'] + x['long_trends_items'], 
-                             reverse=True)
-    
-    for i, template in enumerate(sorted_templates[:10]):
+    # Mostrar templates más problemáticos (ya vienen ordenados del top-K)
+    print(f"\n⚠️  TOP {len(stats['templates_summary'])} TEMPLATES CON MÁS ITEMS PROBLEMÁTICOS")
+    for i, template in enumerate(stats['templates_summary']):
         total_problematic = template['long_history_items'] + template['long_trends_items']
         print(f"   {i+1:2d}. {template['name'][:50]:<50} | "
               f"H:{template['long_history_items']:>3} T:{template['long_trends_items']:>3} "
               f"(Total: {total_problematic})")
     
+    # Mostrar templates que más ocupan
+    top_bytes = stats['top_templates']['estimated_bytes']
+    print(f"\n💾 TOP {len(top_bytes)} TEMPLATES POR ESPACIO ESTIMADO")
+    for i, template in enumerate(top_bytes):
+        print(f"   {i+1:2d}. {template['name'][:50]:<50} | {format_bytes(template['estimated_bytes']):>10} "
+              f"({template['total_items']} items)")
+    
+    top_hosts = stats['top_templates']['hosts']
+    if top_hosts:
+        print(f"\n🖥️  TOP {len(top_hosts)} TEMPLATES POR NÚMERO DE HOSTS")
+        for i, template in enumerate(top_hosts):
+            print(f"   {i+1:2d}. {template['name'][:50]:<50} | {template['hosts']:>6} hosts")
+    
+    # Mostrar percentiles
+    percentiles = stats['percentiles']
+    print(f"\n📐 PERCENTILES")
+    print(f"   {'':<28} " + ' '.join(f"{'p' + str(p):>10}" for p in percentiles['history_days']))
+    print(f"   {'History por item (días)':<28} " + ' '.join(f"{v:>10g}" for v in percentiles['history_days'].values()))
+    print(f"   {'Trends por item (días)':<28} " + ' '.join(f"{v:>10g}" for v in percentiles['trends_days'].values()))
+    print(f"   {'Items problemáticos/template':<28} " + ' '.join(f"{v:>10.0f}" for v in percentiles['problematic_items'].values()))
+    print(f"   {'Espacio/template':<28} " + ' '.join(f"{format_bytes(v):>10}" for v in percentiles['estimated_bytes'].values()))
+    
     # Recomendaciones
     print(f"\n💡 RECOMENDACIONES")
     print(f"   Para entornos de prueba, considera cambiar:")
@@ -193,6 +294,102 @@ def main():
     print(f"   • Esto afectaría a {stats['items_with_long_history']} items de history")
     print(f"   • Y a {stats['items_with_long_trends']} items de trends")
 
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Analiza History/Trends de los templates de Zabbix')
+    parser.add_argument('--export', nargs='+', metavar='FICHERO',
+                        help='Analizar ficheros de configuration.export (XML/YAML/JSON) en lugar de la API')
+    parser.add_argument('--stream', action='store_true',
+                        help='Decodificar la respuesta de la API en streaming (requiere ijson)')
+    parser.add_argument('--report-json', metavar='FICHERO',
+                        help='Guardar las estadísticas en JSON (para combinar shards con merge_template_reports.py)')
+    parser.add_argument('--store', metavar='DIRECTORIO',
+                        help='Añadir la ejecución al histórico columnar (Parquet, requiere pyarrow)')
+    parser.add_argument('--top', type=positive_int, default=DEFAULT_TOP_K, help='Templates a mostrar en cada top')
+    parser.add_argument('--instance', help='Nombre de la instancia en el histórico (por defecto, el host de ZABBIX_URL)')
+    parser.add_argument('--run-id', help='Identificador común de la ejecución en el histórico (ej: el mismo en todos los shards)')
+    add_scope_arguments(parser)
+    args = parser.parse_args()
+    
+    if args.export and (args.template_group or args.templateids or args.shard):
+        parser.error('--template-group, --templateids y --shard solo se aplican a la API')
+    
+    # Los exports pueden venir de servidores distintos: no mezclar sus históricos
+    if args.export and args.store and not args.instance:
+        parser.error('--store con --export requiere --instance')
+    
+    print("📊 Analizador de History/Trends para Templates de Zabbix")
+    print("=" * 60)
+    
+    # El histórico recibe cada template según se analiza, sin acumularlos
+    store_writer = None
+    if args.store:
+        instance = args.instance or urlparse(ZABBIX_URL).netloc or ZABBIX_URL
+        try:
+            store_writer = StoreRunWriter(args.store, instance, run_id=args.run_id)
+        except Exception as e:
+            print(f"❌ Error abriendo el histórico: {e}")
+            sys.exit(1)
+    template_sink = store_writer.add_template if store_writer else None
+    
+    if args.export:
+        # Analizar exports sin conectar a Zabbix
+        print(f"📁 Exports: {', '.join(args.export)}")
+        print("\n🔍 Analizando templates...")
+        aggregator = analyze_export_files(args.export, args.top, template_sink)
+    else:
+        if not ZABBIX_TOKEN:
+            print("❌ Error: ZABBIX_TOKEN no está configurado")
+            sys.exit(1)
+        
+        print(f"🌐 URL: {ZABBIX_URL}")
+        print(f"🎯 Alcance: {describe_scope(args)}")
+        
+        # Conectar a Zabbix
+        api = connect_to_zabbix()
+        if not api:
+            sys.exit(1)
+        
+        try:
+            scope = get_template_scope(api, args)
+        except Exception as e:
+            print(f"❌ Error resolviendo el alcance: {e}")
+            sys.exit(1)
+        
+        # Analizar templates
+        print("\n🔍 Analizando templates...")
+        if scope is None:
+            aggregator = RetentionAggregator(args.top)
+        elif args.stream:
+            aggregator = analyze_templates_stream(api, scope, args.top, template_sink)
+        else:
+            aggregator = analyze_templates(api, scope, args.top, template_sink)
+        print(f"📡 Transferencia: {api.transfer_summary()}")
+    
+    if not aggregator:
+        sys.exit(1)
+    
+    stats = aggregator.to_stats()
+    
+    if args.report_json:
+        report = {
+            'url': None if args.export else ZABBIX_URL,
+            'scope': describe_scope(args),
+            'aggregator': aggregator.to_dict()
+        }
+        with open(args.report_json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False)
+        print(f"💾 Estadísticas guardadas en {args.report_json}")
+    
+    if store_writer:
+        try:
+            run_at = store_writer.close(stats)
+            print(f"📚 Ejecución añadida al histórico {args.store} ({store_writer.instance}, {run_at.isoformat()})")
+        except Exception as e:
+            print(f"❌ Error guardando en el histórico: {e}")
+    
+    print_report(stats)
+
 if __name__ == "__main__":
     main()
 
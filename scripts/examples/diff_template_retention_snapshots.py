@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Script para comparar dos snapshots de History/Trends generados con
+snapshot_template_retention.py y detectar cambios de retención.
+
+Los snapshots están ordenados por (template, hash de la key), así que la
+comparación se hace en una sola pasada sobre ambos ficheros, sin cargarlos en
+memoria. Sale con código 1 si encuentra diferencias.
+"""
+
+import argparse
+import gzip
+import json
+import sys
+
+# Máximo de items detallados por template en la salida
+MAX_DETAIL_PER_TEMPLATE = 20
+
+def read_snapshot(path):
+    """Lee un snapshot y devuelve (metadatos, generador de filas ordenadas)"""
+    f = gzip.open(path, 'rt', encoding='utf-8')
+    header = f.readline()
+
+    if not header.startswith('# '):
+        f.close()
+        raise ValueError(f"{path} no es un snapshot válido")
+
+    meta = json.loads(header[2:])
+
+    def rows():
+        previous = None
+        with f:
+            for line in f:
+                template, khash, itemid, history, trends, key = line.rstrip('\n').split('\t', 5)
+                index = (template, khash)
+
+                if previous is not None and index <= previous:
+                    raise ValueError(f"{path} no está ordenado (template {template}, key {key})")
+                previous = index
+
+                yield index, itemid, history, trends, key
+
+    return meta, rows()
+
+def diff_snapshots(old_rows, new_rows):
+    """Recorre ambos snapshots a la vez y genera (tipo, template, fila_antigua, fila_nueva)"""
+    old = next(old_rows, None)
+    new = next(new_rows, None)
+
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            yield 'removed', old[0][0], old, None
+            old = next(old_rows, None)
+        elif old is None or new[0] < old[0]:
+            yield 'added', new[0][0], None, new
+            new = next(new_rows, None)
+        else:
+            if old[2] != new[2] or old[3] != new[3]:
+                yield 'changed', old[0][0], old, new
+            old = next(old_rows, None)
+            new = next(new_rows, None)
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Compara dos snapshots de History/Trends')
+    parser.add_argument('old', help='Snapshot anterior')
+    parser.add_argument('new', help='Snapshot nuevo')
+    parser.add_argument('--max-detail', type=int, default=MAX_DETAIL_PER_TEMPLATE,
+                        help='Máximo de items detallados por template (0 para solo totales)')
+    args = parser.parse_args()
+
+    print("🔎 Comparador de snapshots de History/Trends")
+    print("=" * 60)
+
+    try:
+        old_meta, old_rows = read_snapshot(args.old)
+        new_meta, new_rows = read_snapshot(args.new)
+    except Exception as e:
+        print(f"❌ Error abriendo snapshots: {e}")
+        sys.exit(2)
+
+    print(f"   Anterior: {args.old} ({old_meta.get('url')}, {old_meta.get('templates')} templates)")
+    print(f"   Nuevo:    {args.new} ({new_meta.get('url')}, {new_meta.get('templates')} templates)")
+
+    # Solo se guardan contadores por template, no los items
+    summary = {}
+    current_template = None
+    shown = 0
+
+    try:
+        for kind, template, old, new in diff_snapshots(old_rows, new_rows):
+            counters = summary.setdefault(template, {'added': 0, 'removed': 0, 'changed': 0})
+            counters[kind] += 1
+
+            if template != current_template:
+                current_template = template
+                shown = 0
+                if args.max_detail > 0:
+                    print(f"\n📋 {template}")
+
+            if shown >= args.max_detail:
+                continue
+            shown += 1
+
+            if kind == 'added':
+                print(f"   ➕ {new[4]} (H:{new[2]} T:{new[3]})")
+            elif kind == 'removed':
+                print(f"   ➖ {old[4]} (H:{old[2]} T:{old[3]})")
+            else:
+                print(f"   🔄 {new[4]} (H:{old[2]}→{new[2]} T:{old[3]}→{new[3]})")
+    except Exception as e:
+        print(f"❌ Error comparando snapshots: {e}")
+        sys.exit(2)
+
+    if not summary:
+        print("\n✅ Sin cambios entre snapshots")
+        return
+
+    print(f"\n📊 RESUMEN POR TEMPLATE")
+    for template, counters in sorted(summary.items()):
+        print(f"   {template[:50]:<50} | +{counters['added']:>5} -{counters['removed']:>5} "
+              f"~{counters['changed']:>5}")
+
+    print(f"\n📋 TOTALES")
+    print(f"   Templates con cambios: {len(summary)}")
+    print(f"   Items añadidos: {sum(c['added'] for c in summary.values())}")
+    print(f"   Items eliminados: {sum(c['removed'] for c in summary.values())}")
+    print(f"   Items modificados: {sum(c['changed'] for c in summary.values())}")
+    sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Verificación posterior a la actualización de History/Trends.
+
+Vuelve a leer solo los items actualizados con llamadas item.get por bloques de
+itemids, en paralelo, y compara los valores de Zabbix con los esperados. Así la
+tasa de éxito sale del estado real y no de la ausencia de excepciones.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from retention_units import parse_time_to_days
+
+# Itemids por llamada a item.get y llamadas simultáneas
+VERIFY_CHUNK_SIZE = 500
+VERIFY_WORKERS = 4
+
+# Máximo de discrepancias a mostrar
+MAX_MISMATCHES_SHOWN = 20
+
+def same_retention(actual, expected):
+    """Compara dos valores de retención por su duración en días"""
+    try:
+        return parse_time_to_days(actual) == parse_time_to_days(expected)
+    except ValueError:
+        return False
+
+def fetch_items(client, itemids):
+    """Lee history/trends de un bloque de itemids"""
+    return client.item.get(itemids=itemids, output=['itemid', 'history', 'trends'])
+
+def verify_updated_items(client, items):
+    """Comprueba en Zabbix que los items tienen los valores new_history/new_trends"""
+    expected = {item['itemid']: item for item in items}
+    itemids = list(expected)
+    chunks = [itemids[i:i + VERIFY_CHUNK_SIZE] for i in range(0, len(itemids), VERIFY_CHUNK_SIZE)]
+
+    result = {
+        'total': len(items),
+        'verified': 0,
+        'normalized': [],
+        'mismatches': [],
+        'missing': []
+    }
+    seen = set()
+
+    with ThreadPoolExecutor(max_workers=VERIFY_WORKERS) as executor:
+        for actual_items in executor.map(lambda chunk: fetch_items(client, chunk), chunks):
+            for actual in actual_items:
+                item = expected[actual['itemid']]
+                seen.add(actual['itemid'])
+
+                if actual['history'] == item['new_history'] and actual['trends'] == item['new_trends']:
+                    result['verified'] += 1
+                elif (same_retention(actual['history'], item['new_history'])
+                        and same_retention(actual['trends'], item['new_trends'])):
+                    # Zabbix guardó un valor equivalente escrito de otra forma
+                    result['verified'] += 1
+                    result['normalized'].append((item, actual))
+                else:
+                    result['mismatches'].append((item, actual))
+
+    result['missing'] = [item for itemid, item in expected.items() if itemid not in seen]
+    return result
+
+def print_verification(result):
+    """Muestra el resultado de la verificación"""
+    print(f"   ✅ Verificados: {result['verified']}/{result['total']}")
+
+    if result['normalized']:
+        print(f"   ℹ️  Normalizados por Zabbix: {len(result['normalized'])}")
+
+    if result['missing']:
+        print(f"   ⚠️  No encontrados: {len(result['missing'])}")
+
+    if result['mismatches']:
+        print(f"   ❌ Discrepancias: {len(result['mismatches'])}")
+        for item, actual in result['mismatches'][:MAX_MISMATCHES_SHOWN]:
+            print(f"      {item['name'][:50]:<50} | H: {actual['history']} (esperado {item['new_history']}) "
+                  f"T: {actual['trends']} (esperado {item['new_trends']})")
+        if len(result['mismatches']) > MAX_MISMATCHES_SHOWN:
+            print(f"      ... y {len(result['mismatches']) - MAX_MISMATCHES_SHOWN} más")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Script para combinar los informes JSON generados por varios shards de
+analyze_template_history_trends.py (--shard i/N --report-json FICHERO) en un
+único informe.
+
+Cada informe guarda el estado combinable del agregador (contadores, top-K y
+sketches de percentiles), así el informe combinado es el mismo que el de una
+única ejecución sobre todos los templates.
+"""
+
+import argparse
+import json
+import sys
+from analyze_template_history_trends import print_report
+from retention_aggregation import RetentionAggregator
+
+def merge_aggregators(reports):
+    """Combina el estado de los agregadores de varios shards en uno solo"""
+    merged = None
+
+    for report in reports:
+        aggregator = RetentionAggregator.from_dict(report['aggregator'])
+        if merged is None:
+            merged = aggregator
+        else:
+            merged.merge(aggregator)
+
+    return merged
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Combina informes JSON de varios shards')
+    parser.add_argument('reports', nargs='+', metavar='FICHERO', help='Informes generados con --report-json')
+    args = parser.parse_args()
+
+    print("🧩 Combinador de informes de History/Trends")
+    print("=" * 60)
+
+    try:
+        reports = []
+        for path in args.reports:
+            with open(path, encoding='utf-8') as f:
+                reports.append(json.load(f))
+
+        urls = {report.get('url') for report in reports}
+        if len(urls) > 1:
+            print(f"⚠️  Los informes provienen de servidores distintos: {', '.join(str(u) for u in urls)}")
+
+        for path, report in zip(args.reports, reports):
+            print(f"   📄 {path}: {report.get('scope')}, {report['aggregator']['counters']['total_templates']} templates")
+
+        stats = merge_aggregators(reports).to_stats()
+    except Exception as e:
+        print(f"❌ Error combinando informes: {e}")
+        sys.exit(1)
+
+    print_report(stats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Script para consultar el histórico de ejecuciones del analizador guardado con
+analyze_template_history_trends.py --store, sin volver a consultar la API.
+
+Ejemplo: items con History > 7d por template en los últimos 90 días
+    query_template_history_trends.py --store ./analysis --metric long_history_items --days 90
+"""
+
+import argparse
+import sys
+from analysis_store import query_template_trend, query_value_distribution
+
+METRICS = ['long_history_items', 'long_trends_items', 'total_items', 'estimated_bytes', 'hosts']
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Consulta el histórico de análisis de History/Trends')
+    parser.add_argument('--store', required=True, metavar='DIRECTORIO', help='Directorio del almacén')
+    parser.add_argument('--metric', choices=METRICS, default='long_history_items', help='Métrica por template')
+    parser.add_argument('--days', type=int, default=90, help='Días hacia atrás')
+    parser.add_argument('--instance', help='Limitar a una instancia')
+    parser.add_argument('--limit', type=int, default=20, help='Máximo de templates a mostrar')
+    parser.add_argument('--distribution', choices=['history', 'trends'],
+                        help='Mostrar la distribución de valores de la última ejecución')
+    args = parser.parse_args()
+
+    print("📚 Histórico de análisis de History/Trends")
+    print("=" * 60)
+
+    try:
+        if args.distribution:
+            rows = query_value_distribution(args.store, args.distribution, args.instance)
+        else:
+            rows = query_template_trend(args.store, args.metric, args.days, args.instance)
+    except Exception as e:
+        print(f"❌ Error consultando el almacén: {e}")
+        sys.exit(1)
+
+    if not rows:
+        print("ℹ️  No hay datos para la consulta")
+        return
+
+    if args.distribution:
+        print(f"\n📅 DISTRIBUCIÓN DE VALORES DE {args.distribution.upper()} (última ejecución)")
+        for row in rows:
+            print(f"   {row['instance'][:30]:<30} {row['value']:>6}: {row['count']:>8} items")
+        return
+
+    metric = args.metric
+    print(f"\n📈 {metric} POR TEMPLATE (últimos {args.days} días)")
+    print(f"   {'Template':<45} {'Instancia':<20} {'Inicio':>7} {'Actual':>7} {'Mín':>7} {'Máx':>7} {'Runs':>5}")
+
+    for row in rows[:args.limit]:
+        first = row[f"{metric}_first"]
+        last = row[f"{metric}_last"]
+        trend = '⬇️' if last < first else ('⬆️' if last > first else '  ')
+        print(f"   {row['name_last'][:45]:<45} {row['instance'][:20]:<20} {first:>7} {last:>7} "
+              f"{row[f'{metric}_min']:>7} {row[f'{metric}_max']:>7} {row['run_at_count']:>5} {trend}")
+
+    if len(rows) > args.limit:
+        print(f"   ... y {len(rows) - args.limit} templates más")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Agregación en streaming de las estadísticas de History/Trends.
+
+RetentionAggregator recorre los templates una sola vez y solo guarda
+contadores, los top-K templates de cada métrica en heaps acotados, sketches
+de percentiles y los ids ya vistos (para rechazar duplicados). Su estado es combinable: los resultados parciales de varios
+shards o páginas se suman con merge() y dan exactamente el mismo top-K y
+contadores que una pasada única, con un coste de informe que no crece con el
+inventario.
+"""
+
+import heapq
+import itertools
+import math
+from collections import Counter
+from retention_units import parse_delay_to_seconds, parse_time_to_days
+
+# Templates a conservar por métrica
+DEFAULT_TOP_K = 10
+
+# Métricas por template para las que se guarda top-K y percentiles
+TEMPLATE_METRICS = ['problematic_items', 'estimated_bytes', 'hosts']
+
+# Percentiles que se muestran en el informe
+REPORT_PERCENTILES = [50, 90, 99]
+
+# Bytes aproximados por fila en las tablas de history y trends
+HISTORY_ROW_BYTES = 50
+TRENDS_ROW_BYTES = 90
+
+def estimate_item_bytes(history_days, trends_days, delay):
+    """Estima los bytes que ocupa un item con su retención actual"""
+    history_rows = history_days * 86400 / parse_delay_to_seconds(delay)
+    trends_rows = trends_days * 24
+    return int(history_rows * HISTORY_ROW_BYTES + trends_rows * TRENDS_ROW_BYTES)
+
+class LogHistogram:
+    """Sketch de percentiles con buckets logarítmicos y error relativo acotado
+
+    Dos sketches con la misma precisión se combinan sumando sus buckets, sin
+    perder exactitud respecto a un sketch único.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = Counter()
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value):
+        """Añade un valor no negativo"""
+        self.count += 1
+        if value <= 0:
+            self.zeros += 1
+        else:
+            self.buckets[math.ceil(math.log(value) / self.log_gamma)] += 1
+
+    def merge(self, other):
+        """Suma otro sketch con la misma precisión"""
+        self.buckets.update(other.buckets)
+        self.zeros += other.zeros
+        self.count += other.count
+
+    def quantile(self, q):
+        """Devuelve el valor aproximado del cuantil q (0-1)"""
+        if not self.count:
+            return 0
+
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0
+
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'buckets': {str(index): count for index, count in self.buckets.items()},
+            'zeros': self.zeros,
+            'count': self.count
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['relative_accuracy'])
+        sketch.buckets = Counter({int(index): count for index, count in data['buckets'].items()})
+        sketch.zeros = data['zeros']
+        sketch.count = data['count']
+        return sketch
+
+def counter_quantile(counter, q):
+    """Cuantil exacto de una distribución {valor: cantidad}"""
+    total = sum(counter.values())
+    if not total:
+        return 0
+
+    rank = q * (total - 1)
+    seen = 0
+    for value in sorted(counter):
+        seen += counter[value]
+        if rank < seen:
+            return value
+
+    return max(counter)
+
+class RetentionAggregator:
+    """Acumula las estadísticas de History/Trends template a template"""
+
+    COUNTERS = [
+        'total_templates',
+        'templates_with_long_history',
+        'templates_with_long_trends',
+        'total_items',
+        'items_with_long_history',
+        'items_with_long_trends'
+    ]
+
+    def __init__(self, top_k=DEFAULT_TOP_K):
+        if top_k < 1:
+            raise ValueError(f"top_k debe ser al menos 1 (recibido {top_k})")
+        self.top_k = top_k
+        self.counters = Counter({name: 0 for name in self.COUNTERS})
+        self.history_values = Counter()
+        self.trends_values = Counter()
+        self.history_days = Counter()
+        self.trends_days = Counter()
+        self.top = {metric: [] for metric in TEMPLATE_METRICS}
+        self.sketches = {metric: LogHistogram() for metric in TEMPLATE_METRICS}
+        # Desempate único en los heaps, así nunca se comparan los diccionarios
+        self.sequence = itertools.count()
+        self.seen_templateids = set()
+
+    def add_template(self, template):
+        """Procesa un template (sus items pueden ser un generador) y devuelve su resumen
+
+        Un mismo templateid dos veces (ej: el UUID de un template de stock en dos
+        exports) se rechaza con ValueError: se contaría dos veces.
+        """
+        templateid = str(template['templateid'])
+        if templateid in self.seen_templateids:
+            raise ValueError(f"El template {template['name']} ({templateid}) aparece más de una vez")
+        self.seen_templateids.add(templateid)
+
+        template_stats = {
+            'name': template['name'],
+            'templateid': template['templateid'],
+            'total_items': 0,
+            'long_history_items': 0,
+            'long_trends_items': 0,
+            'estimated_bytes': 0
+        }
+
+        for item in template.get('items', []):
+            history = item.get('history', '')
+            trends = item.get('trends', '')
+
+            self.history_values[history] += 1
+            self.trends_values[trends] += 1
+
+            history_days = parse_time_to_days(history)
+            trends_days = parse_time_to_days(trends)
+            self.history_days[history_days] += 1
+            self.trends_days[trends_days] += 1
+
+            template_stats['total_items'] += 1
+            template_stats['estimated_bytes'] += estimate_item_bytes(history_days, trends_days, item.get('delay'))
+
+            if history_days > 7:
+                template_stats['long_history_items'] += 1
+            if trends_days > 30:
+                template_stats['long_trends_items'] += 1
+
+        # 'hosts' llega como número con selectHosts='count'; puede venir tras los items
+        hosts = template.get('hosts')
+        template_stats['hosts'] = int(hosts or 0)
+        # Las filas las guarda cada host enlazado; sin el dato (exports) se cuenta una copia
+        if hosts is not None:
+            template_stats['estimated_bytes'] *= template_stats['hosts']
+        template_stats['problematic_items'] = template_stats['long_history_items'] + template_stats['long_trends_items']
+
+        self.counters['total_templates'] += 1
+        self.counters['total_items'] += template_stats['total_items']
+        self.counters['items_with_long_history'] += template_stats['long_history_items']
+        self.counters['items_with_long_trends'] += template_stats['long_trends_items']
+        if template_stats['long_history_items']:
+            self.counters['templates_with_long_history'] += 1
+        if template_stats['long_trends_items']:
+            self.counters['templates_with_long_trends'] += 1
+
+        for metric in TEMPLATE_METRICS:
+            self.sketches[metric].add(template_stats[metric])
+            if template_stats[metric] > 0:
+                self._push_top(metric, template_stats)
+
+        return template_stats
+
+    def _push_top(self, metric, template_stats):
+        """Mantiene en un heap acotado los top-K templates de una métrica"""
+        entry = (template_stats[metric], str(template_stats['templateid']), next(self.sequence), template_stats)
+        heap = self.top[metric]
+
+        if len(heap) < self.top_k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+
+    def merge(self, other):
+        """Combina el estado de otro agregador (otro shard o página)
+
+        Los resultados parciales deben cubrir templates distintos. Si un mismo
+        template aparece en el top-K de ambos, se contaría dos veces y se lanza
+        ValueError.
+        """
+        for metric in TEMPLATE_METRICS:
+            own = {entry[1] for entry in self.top[metric]}
+            for _, templateid, _, template_stats in other.top[metric]:
+                if templateid in own:
+                    raise ValueError(f"El template {template_stats['name']} ({templateid}) aparece en más de un shard")
+
+        self.seen_templateids.update(other.seen_templateids)
+        self.counters.update(other.counters)
+        self.history_values.update(other.history_values)
+        self.trends_values.update(other.trends_values)
+        self.history_days.update(other.history_days)
+        self.trends_days.update(other.trends_days)
+
+        for metric in TEMPLATE_METRICS:
+            self.sketches[metric].merge(other.sketches[metric])
+            for _, _, _, template_stats in other.top[metric]:
+                self._push_top(metric, template_stats)
+
+    def top_templates(self, metric):
+        """Top-K templates de una métrica, de mayor a menor"""
+        return [entry[3] for entry in sorted(self.top[metric], key=lambda e: e[:2], reverse=True)]
+
+    def percentiles(self):
+        """Percentiles por template (aproximados) y por item (exactos)"""
+        result = {}
+
+        for metric in TEMPLATE_METRICS:
+            result[metric] = {p: self.sketches[metric].quantile(p / 100) for p in REPORT_PERCENTILES}
+        result['history_days'] = {p: counter_quantile(self.history_days, p / 100) for p in REPORT_PERCENTILES}
+        result['trends_days'] = {p: counter_quantile(self.trends_days, p / 100) for p in REPORT_PERCENTILES}
+
+        return result
+
+    def to_stats(self):
+        """Devuelve la estructura de estadísticas que usa el informe"""
+        stats = dict(self.counters)
+        stats['history_values'] = dict(self.history_values)
+        stats['trends_values'] = dict(self.trends_values)
+        stats['templates_summary'] = self.top_templates('problematic_items')
+        stats['top_templates'] = {metric: self.top_templates(metric) for metric in TEMPLATE_METRICS}
+        stats['percentiles'] = self.percentiles()
+        return stats
+
+    def to_dict(self):
+        """Serializa el estado para combinarlo más tarde (ej: informes de shards)"""
+        return {
+            'top_k': self.top_k,
+            'counters': dict(self.counters),
+            'history_values': dict(self.history_values),
+            'trends_values': dict(self.trends_values),
+            'history_days': [[days, count] for days, count in self.history_days.items()],
+            'trends_days': [[days, count] for days, count in self.trends_days.items()],
+            'top': {metric: self.top_templates(metric) for metric in TEMPLATE_METRICS},
+            'sketches': {metric: sketch.to_dict() for metric, sketch in self.sketches.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregator = cls(data['top_k'])
+        aggregator.counters = Counter(data['counters'])
+        aggregator.history_values = Counter(data['history_values'])
+        aggregator.trends_values = Counter(data['trends_values'])
+        aggregator.history_days = Counter({days: count for days, count in data['history_days']})
+        aggregator.trends_days = Counter({days: count for days, count in data['trends_days']})
+        aggregator.sketches = {metric: LogHistogram.from_dict(sketch) for metric, sketch in data['sketches'].items()}
+
+        for metric, templates in data['top'].items():
+            for template_stats in templates:
+                aggregator._push_top(metric, template_stats)
+
+        return aggregator
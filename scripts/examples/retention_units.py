@@ -0,0 +1,48 @@
+"""
+Conversión de los valores de retención e intervalo de los items de Zabbix.
+
+Definición única para los módulos compartidos de scripts/examples
+(agregación, verificación y rollout).
+"""
+
+# Intervalo supuesto para items sin intervalo fijo (trapper, macros, dependientes)
+DEFAULT_DELAY_SECONDS = 60
+
+def parse_time_to_days(time_str):
+    """Convierte string de tiempo a días (ej: '31d' -> 31)"""
+    if not time_str or time_str == '0':
+        return 0
+
+    time_str = str(time_str).lower()
+
+    if time_str.endswith('d'):
+        return int(time_str[:-1])
+    elif time_str.endswith('w'):
+        return int(time_str[:-1]) * 7
+    elif time_str.endswith('m'):
+        return int(time_str[:-1]) * 30
+    elif time_str.endswith('y'):
+        return int(time_str[:-1]) * 365
+    elif time_str.endswith('h'):
+        return int(time_str[:-1]) / 24
+    else:
+        try:
+            return int(time_str)
+        except:
+            return 0
+
+def parse_delay_to_seconds(delay):
+    """Convierte el intervalo de un item a segundos (ej: '1m' -> 60)"""
+    # Los intervalos flexibles van tras ';', nos quedamos con el principal
+    delay = str(delay or '').split(';')[0].strip().lower()
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+    try:
+        if delay and delay[-1] in units:
+            seconds = int(delay[:-1]) * units[delay[-1]]
+        else:
+            seconds = int(delay)
+    except ValueError:
+        return DEFAULT_DELAY_SECONDS
+
+    return seconds if seconds > 0 else DEFAULT_DELAY_SECONDS
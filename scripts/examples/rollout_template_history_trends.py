@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Script para reducir History y Trends de forma escalonada y repartir la carga
+de borrado del housekeeper de Zabbix.
+
+Bajar de golpe de 31d a 7d y de 365d a 30d hace que el housekeeper borre meses
+de filas a la vez, lo que satura la base de datos. Este script baja la
+retención por escalones (ej: Trends 365d → 180d → 90d → 30d). En cada ejecución
+solo aplica cambios hasta un máximo de filas estimadas a borrar, solo dentro de
+la ventana horaria configurada, y guarda el estado entre ejecuciones.
+
+Los candidatos y los valores finales salen de get_top_problematic_templates()
+de update_template_history_trends_auto.py. Pensado para ejecutarse desde cron.
+"""
+
+import argparse
+import json
+import sys
+import os
+import time
+from datetime import datetime
+from update_template_history_trends_auto import (
+    ZABBIX_TOKEN,
+    ZABBIX_URL,
+    connect_to_zabbix,
+    get_top_problematic_templates,
+    update_template_items
+)
+from retention_units import parse_delay_to_seconds, parse_time_to_days
+from item_verification import print_verification, verify_updated_items
+from template_scope import add_scope_arguments, describe_scope, get_template_scope
+
+# Escalones de retención en días, de mayor a menor
+HISTORY_STEPS_DAYS = [90, 31, 14, 7]
+TRENDS_STEPS_DAYS = [365, 180, 90, 30]
+
+# Máximo de filas estimadas a borrar por ejecución
+DEFAULT_MAX_ROWS = 50_000_000
+
+# Horas mínimas entre dos escalones del mismo item (tiempo para el housekeeper)
+DEFAULT_MIN_HOURS_BETWEEN_STEPS = 24
+
+DEFAULT_STATE_FILE = 'rollout_state.json'
+
+def next_step(current, target, steps):
+    """Devuelve el siguiente escalón entre el valor actual y el objetivo"""
+    current_days = parse_time_to_days(current)
+    target_days = parse_time_to_days(target)
+
+    if current_days <= target_days:
+        return current
+
+    for step in steps:
+        if target_days < step < current_days:
+            return f"{step}d"
+
+    return target
+
+def estimate_rows_to_delete(item, new_history, new_trends, hosts=1):
+    """Estima las filas que el housekeeper borrará al aplicar el escalón
+
+    El item del template no guarda filas: las guarda la copia del item en cada
+    host enlazado, así que la estimación se multiplica por hosts.
+    """
+    history_days = parse_time_to_days(item['current_history']) - parse_time_to_days(new_history)
+    trends_days = parse_time_to_days(item['current_trends']) - parse_time_to_days(new_trends)
+
+    history_rows = max(history_days, 0) * 86400 / parse_delay_to_seconds(item.get('delay'))
+    # Trends guarda una fila por hora
+    trends_rows = max(trends_days, 0) * 24
+
+    return int((history_rows + trends_rows) * hosts)
+
+def positive_int(value):
+    """Entero mayor que 0, para argparse"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"debe ser al menos 1 (recibido {value})")
+    return number
+
+def parse_window(value):
+    """Convierte 'HH:MM-HH:MM' en (inicio, fin) como datetime.time, para argparse"""
+    try:
+        start, end = value.split('-')
+        return (datetime.strptime(start.strip(), '%H:%M').time(),
+                datetime.strptime(end.strip(), '%H:%M').time())
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ventana inválida '{value}', formato HH:MM-HH:MM")
+
+def in_window(window, now=None):
+    """Comprueba si la hora actual está en la ventana (inicio, fin) (puede cruzar medianoche)"""
+    if not window:
+        return True
+
+    now = (now or datetime.now()).time()
+    start, end = window
+
+    if start <= end:
+        return start <= now < end
+    return now >= start or now < end
+
+def load_state(path):
+    """Carga el estado del rollout o uno vacío si no existe"""
+    if not os.path.exists(path):
+        return {'items': {}, 'runs': []}
+
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_state(path, state):
+    """Guarda el estado del rollout de forma atómica"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def plan_rollout_step(templates, state, max_rows, min_hours):
+    """Construye el conjunto de cambios de esta ejecución sin superar max_rows"""
+    now = time.time()
+    budget = max_rows
+    planned = []
+    pending_items = 0
+
+    for template in templates:
+        items = []
+
+        for item in template['items']:
+            new_history = next_step(item['current_history'], item['new_history'], HISTORY_STEPS_DAYS)
+            new_trends = next_step(item['current_trends'], item['new_trends'], TRENDS_STEPS_DAYS)
+
+            if new_history == item['current_history'] and new_trends == item['current_trends']:
+                continue
+
+            # Dar tiempo al housekeeper antes del siguiente escalón del mismo item
+            last_step = state['items'].get(item['itemid'], {}).get('stepped_at', 0)
+            if now - last_step < min_hours * 3600:
+                pending_items += 1
+                continue
+
+            rows = estimate_rows_to_delete(item, new_history, new_trends, template.get('hosts', 1))
+            # Un item que supera el máximo por sí solo se aplica solo, en su propia ejecución
+            if rows > budget and budget != max_rows:
+                pending_items += 1
+                continue
+
+            budget -= rows
+            items.append(dict(item, new_history=new_history, new_trends=new_trends, estimated_rows=rows))
+
+        if items:
+            planned.append({
+                'templateid': template['templateid'],
+                'name': template['name'],
+                'hosts': template.get('hosts', 1),
+                'items': items,
+                'score': len(items)
+            })
+
+    return planned, max_rows - budget, pending_items
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Reduce History/Trends por escalones repartiendo la carga')
+    parser.add_argument('--state', default=DEFAULT_STATE_FILE, help='Fichero de estado entre ejecuciones')
+    parser.add_argument('--max-rows', type=positive_int, default=DEFAULT_MAX_ROWS,
+                        help='Máximo de filas estimadas a borrar por ejecución')
+    parser.add_argument('--window', metavar='HH:MM-HH:MM', type=parse_window,
+                        help='Ventana horaria en la que se permite aplicar')
+    parser.add_argument('--min-hours', type=float, default=DEFAULT_MIN_HOURS_BETWEEN_STEPS,
+                        help='Horas mínimas entre escalones del mismo item')
+    parser.add_argument('--dry-run', action='store_true', help='Mostrar el escalón sin aplicarlo')
+    add_scope_arguments(parser)
+    args = parser.parse_args()
+
+    print("🪜 Rollout escalonado de History/Trends para Templates de Zabbix")
+    print("=" * 70)
+
+    if not ZABBIX_TOKEN:
+        print("❌ Error: ZABBIX_TOKEN no está configurado")
+        sys.exit(1)
+
+    print(f"🌐 URL: {ZABBIX_URL}")
+    print(f"🎯 Alcance: {describe_scope(args)}")
+    print(f"📅 Escalones: History {HISTORY_STEPS_DAYS} / Trends {TRENDS_STEPS_DAYS} días")
+    print(f"🗑️  Máximo por ejecución: {args.max_rows:,} filas estimadas")
+
+    if not args.dry_run and not in_window(args.window):
+        start, end = args.window
+        print(f"⏸️  Fuera de la ventana {start:%H:%M}-{end:%H:%M}, no se aplican cambios")
+        return
+
+    try:
+        state = load_state(args.state)
+    except Exception as e:
+        print(f"❌ Error leyendo el estado {args.state}: {e}")
+        sys.exit(1)
+
+    # Conectar a Zabbix
+    api = connect_to_zabbix()
+    if not api:
+        sys.exit(1)
+
+    try:
+        scope = get_template_scope(api, args)
+    except Exception as e:
+        print(f"❌ Error resolviendo el alcance: {e}")
+        sys.exit(1)
+
+    print(f"\n🔍 Planificando escalón...")
+    templates = get_top_problematic_templates(api, scope, max_templates=None, max_items=None) if scope is not None else []
+    planned, estimated_rows, pending_items = plan_rollout_step(templates, state, args.max_rows, args.min_hours)
+
+    if not planned:
+        if pending_items:
+            print(f"⏳ {pending_items} items pendientes, esperando al housekeeper o a más presupuesto")
+        else:
+            print("✅ Rollout completado: no quedan items por encima del objetivo")
+        return
+
+    total_items = sum(len(t['items']) for t in planned)
+    print(f"📋 Escalón: {total_items} items en {len(planned)} templates")
+    print(f"🗑️  Filas estimadas a borrar: {estimated_rows:,}")
+    print(f"⏳ Items pendientes para próximas ejecuciones: {pending_items}")
+
+    if args.dry_run:
+        for template in planned:
+            print(f"   {template['name'][:60]:<60} | {template['score']:>4} items x {template['hosts']:>4} hosts")
+        return
+
+    print(f"\n🚀 Aplicando escalón...")
+    for template in planned:
+        update_template_items(api, template)
+
+    # Solo se registran en el estado los items verificados en Zabbix
+    print(f"\n🔍 Verificando items actualizados...")
+    items = [item for t in planned for item in t['items']]
+    verified = True
+    try:
+        verification = verify_updated_items(api, items)
+        print_verification(verification)
+        failed = {item['itemid'] for item, _ in verification['mismatches']}
+        failed.update(item['itemid'] for item in verification['missing'])
+    except Exception as e:
+        # Sin verificación no se sabe qué se aplicó: no se registra ningún item
+        print(f"❌ Error verificando items: {e}")
+        verified = False
+        failed = {item['itemid'] for item in items}
+
+    now = time.time()
+    for item in items:
+        if item['itemid'] in failed:
+            continue
+        state['items'][item['itemid']] = {
+            'history': item['new_history'],
+            'trends': item['new_trends'],
+            'stepped_at': now
+        }
+
+    state['runs'].append({
+        'at': datetime.now().isoformat(timespec='seconds'),
+        'items': total_items - len(failed),
+        'verified': verified,
+        'estimated_rows': estimated_rows,
+        'pending_items': pending_items
+    })
+    save_state(args.state, state)
+
+    if verified:
+        print(f"\n🎉 Escalón aplicado!")
+    else:
+        print(f"\n⚠️  Escalón sin verificar: sus items no se registran y se revisarán en la próxima ejecución")
+    print(f"💾 Estado guardado en {args.state}")
+    print(f"📡 Transferencia: {api.transfer_summary()}")
+
+if __name__ == "__main__":
+    main()
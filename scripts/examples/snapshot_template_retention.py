@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Script para generar un snapshot compacto de los valores de History y Trends de
+todos los items de los templates de Zabbix.
+
+El snapshot es un fichero de texto comprimido con gzip, con una línea por item
+ordenada por (template, hash de la key). Ese orden permite compararlo con otro
+snapshot en tiempo lineal con diff_template_retention_snapshots.py.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import sys
+import os
+import time
+from dotenv import load_dotenv
+from template_scope import add_scope_arguments, describe_scope, get_template_scope
+from zabbix_stream import ZabbixStreamClient
+
+# Cargar variables de entorno desde .env
+load_dotenv()
+
+# Configuración desde variables de entorno
+ZABBIX_URL = os.getenv('ZABBIX_URL', 'http://localhost:8080')
+ZABBIX_TOKEN = os.getenv('ZABBIX_TOKEN')
+
+# Comprimir también las peticiones (el servidor web debe aceptar Content-Encoding: gzip)
+ZABBIX_COMPRESS_REQUESTS = os.getenv('ZABBIX_COMPRESS_REQUESTS', '').lower() in ('1', 'true', 'yes')
+
+# Formato del snapshot
+SNAPSHOT_FORMAT = 'zabbix-retention-snapshot/1'
+
+# Templates por llamada a item.get (limita la memoria usada al escribir)
+TEMPLATES_PER_BATCH = 50
+
+def connect_to_zabbix():
+    """Conecta a la API de Zabbix usando token"""
+    try:
+        # Todo el tráfico del script pasa por este cliente (gzip/deflate y cuenta de bytes)
+        api = ZabbixStreamClient(ZABBIX_URL, ZABBIX_TOKEN, compress_requests=ZABBIX_COMPRESS_REQUESTS)
+        print(f"✅ Conectado a Zabbix API versión: {api.api_version()}")
+        return api
+    except Exception as e:
+        print(f"❌ Error conectando a Zabbix: {e}")
+        return None
+
+def key_hash(key):
+    """Hash corto y de ancho fijo de la key de un item, usado como índice"""
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+def clean_field(value):
+    """Elimina tabuladores y saltos de línea para no romper el formato"""
+    return str(value).replace('\t', ' ').replace('\n', ' ').replace('\r', ' ')
+
+def format_row(template, item):
+    """Formatea la línea de un item: template, hash, itemid, history, trends, key"""
+    return '\t'.join([
+        clean_field(template),
+        key_hash(item['key_']),
+        str(item['itemid']),
+        clean_field(item.get('history', '')),
+        clean_field(item.get('trends', '')),
+        clean_field(item['key_'])
+    ]) + '\n'
+
+def write_snapshot(api, path, scope=None):
+    """Escribe el snapshot procesando los templates por lotes"""
+    templates = api.template.get(output=['templateid', 'host'], **(scope or {}))
+    templates.sort(key=lambda t: clean_field(t['host']))
+
+    total_items = 0
+
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        meta = {
+            'format': SNAPSHOT_FORMAT,
+            'url': ZABBIX_URL,
+            'created_at': int(time.time()),
+            'templates': len(templates)
+        }
+        f.write(f"# {json.dumps(meta, sort_keys=True)}\n")
+
+        for start in range(0, len(templates), TEMPLATES_PER_BATCH):
+            batch = templates[start:start + TEMPLATES_PER_BATCH]
+            items = api.item.get(
+                templateids=[t['templateid'] for t in batch],
+                output=['itemid', 'hostid', 'key_', 'history', 'trends']
+            )
+
+            # Agrupar los items del lote por template
+            items_by_template = {}
+            for item in items:
+                items_by_template.setdefault(item['hostid'], []).append(item)
+
+            for template in batch:
+                template_items = items_by_template.get(template['templateid'], [])
+                template_items.sort(key=lambda i: key_hash(i['key_']))
+
+                for item in template_items:
+                    f.write(format_row(template['host'], item))
+
+                total_items += len(template_items)
+
+            print(f"   📦 {min(start + TEMPLATES_PER_BATCH, len(templates))}/{len(templates)} templates, "
+                  f"{total_items} items")
+
+    return len(templates), total_items
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Genera un snapshot de History/Trends de los templates')
+    parser.add_argument('output', help='Fichero de salida (ej: snapshot-2025-09-20.tsv.gz)')
+    add_scope_arguments(parser)
+    args = parser.parse_args()
+
+    print("📸 Snapshot de History/Trends para Templates de Zabbix")
+    print("=" * 60)
+
+    if not ZABBIX_TOKEN:
+        print("❌ Error: ZABBIX_TOKEN no está configurado")
+        sys.exit(1)
+
+    print(f"🌐 URL: {ZABBIX_URL}")
+    print(f"🎯 Alcance: {describe_scope(args)}")
+
+    # Conectar a Zabbix
+    api = connect_to_zabbix()
+    if not api:
+        sys.exit(1)
+
+    try:
+        scope = get_template_scope(api, args)
+        if scope is None:
+            print("✅ El alcance no contiene ningún template")
+            return
+
+        print(f"\n🔍 Escribiendo snapshot en {args.output}...")
+        total_templates, total_items = write_snapshot(api, args.output, scope)
+    except Exception as e:
+        print(f"❌ Error generando snapshot: {e}")
+        sys.exit(1)
+
+    print(f"\n🎉 Snapshot completado!")
+    print(f"   Templates: {total_templates}")
+    print(f"   Items: {total_items}")
+    print(f"📡 Transferencia: {api.transfer_summary()}")
+
+if __name__ == "__main__":
+    main()
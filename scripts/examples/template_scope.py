@@ -0,0 +1,88 @@
+"""
+Utilidades compartidas para limitar el alcance de los scripts a un grupo de
+templates, a una lista de templateids o a un shard (partición por hash).
+
+El shard de un template es crc32(templateid) % N, el mismo cálculo que usa
+OptimizeTemplatesJob, así que N procesos con --shard 0/N ... N-1/N cubren todos
+los templates sin solaparse.
+"""
+
+import argparse
+import zlib
+
+def parse_shard(value):
+    """Convierte 'i/N' en (i, N) con 0 <= i < N"""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard inválido '{value}', formato esperado i/N")
+
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard inválido '{value}', se requiere 0 <= i < N")
+
+    return index, count
+
+def add_scope_arguments(parser):
+    """Añade las opciones --template-group, --templateids y --shard al parser"""
+    parser.add_argument('--template-group', action='append', metavar='NOMBRE',
+                        help='Limitar a templates de este grupo (se puede repetir)')
+    parser.add_argument('--templateids', nargs='+', metavar='ID',
+                        help='Limitar a estos templateids')
+    parser.add_argument('--shard', type=parse_shard, metavar='i/N',
+                        help='Procesar solo el shard i de N (0 <= i < N) por hash del templateid')
+
+def template_shard(templateid, count):
+    """Devuelve el shard al que pertenece un templateid"""
+    return zlib.crc32(str(templateid).encode('utf-8')) % count
+
+def get_template_groupids(api, names):
+    """Resuelve nombres de grupo a groupids (templategroup desde Zabbix 6.2, hostgroup antes)"""
+    # Elegir por versión: un error de red o de auth no debe caer en hostgroup
+    if api.api_version() >= 6.2:
+        groups = api.templategroup.get(output=['groupid', 'name'], filter={'name': names})
+    else:
+        groups = api.hostgroup.get(output=['groupid', 'name'], filter={'name': names})
+
+    missing = set(names) - {group['name'] for group in groups}
+    if missing:
+        raise ValueError(f"Grupos no encontrados: {', '.join(sorted(missing))}")
+
+    return [group['groupid'] for group in groups]
+
+def get_template_scope(api, args):
+    """Devuelve los parámetros de template.get que limitan el alcance según args
+
+    Devuelve None si el alcance no contiene ningún template.
+    """
+    params = {}
+
+    if args.template_group:
+        params['groupids'] = get_template_groupids(api, args.template_group)
+    if args.templateids:
+        params['templateids'] = args.templateids
+
+    if args.shard:
+        index, count = args.shard
+        templates = api.template.get(output=['templateid'], **params)
+        params = {
+            'templateids': [t['templateid'] for t in templates
+                            if template_shard(t['templateid'], count) == index]
+        }
+
+    if 'templateids' in params and not params['templateids']:
+        return None
+
+    return params
+
+def describe_scope(args):
+    """Descripción legible del alcance para mostrar en la cabecera de los scripts"""
+    parts = []
+
+    if args.template_group:
+        parts.append(f"grupos={', '.join(args.template_group)}")
+    if args.templateids:
+        parts.append(f"templateids={len(args.templateids)}")
+    if args.shard:
+        parts.append(f"shard={args.shard[0]}/{args.shard[1]}")
+
+    return ' '.join(parts) if parts else 'todos los templates'
@@ -0,0 +1,11 @@
+"""
+Configuración de pytest para los scripts de ejemplo.
+
+Los scripts se importan como módulos sueltos desde scripts/examples, igual que
+cuando se ejecutan desde ese directorio.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
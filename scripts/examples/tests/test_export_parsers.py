@@ -0,0 +1,148 @@
+"""Tests de los lectores incrementales de configuration.export (XML, YAML y JSON)"""
+
+import json
+
+import pytest
+
+from analyze_template_history_trends import analyze_export_files, iter_export_templates
+
+XML_EXPORT = """<?xml version="1.0" encoding="UTF-8"?>
+<zabbix_export>
+    <version>6.0</version>
+    <template_groups><template_group><uuid>g1</uuid><name>Templates</name></template_group></template_groups>
+    <templates>
+        <template>
+            <uuid>abc</uuid>
+            <template>Linux by Zabbix</template>
+            <name>Linux by Zabbix</name>
+            <items>
+                <item>
+                    <uuid>i1</uuid>
+                    <name>CPU</name>
+                    <key>system.cpu.load</key>
+                    <history>31d</history>
+                    <preprocessing><step><type>MULTIPLIER</type><parameters><parameter>8</parameter></parameters></step></preprocessing>
+                </item>
+                <item>
+                    <uuid>i2</uuid>
+                    <name>Name</name>
+                    <key>system.uname</key>
+                    <delay>1h</delay>
+                    <value_type>CHAR</value_type>
+                    <history>7d</history>
+                </item>
+            </items>
+            <discovery_rules>
+                <discovery_rule>
+                    <name>fs</name>
+                    <key>vfs.fs.discovery</key>
+                    <item_prototypes><item_prototype><name>p</name><key>vfs.fs.size[{#FS},free]</key></item_prototype></item_prototypes>
+                </discovery_rule>
+            </discovery_rules>
+        </template>
+        <template>
+            <uuid>def</uuid>
+            <template>T2</template>
+            <name>T2</name>
+            <items><item><uuid>i3</uuid><name>x</name><key>x</key><history>7d</history><trends>30d</trends></item></items>
+        </template>
+    </templates>
+    <graphs><graph><name>g</name><graph_items><graph_item><item><host>T2</host><key>x</key></item></graph_item></graph_items></graph></graphs>
+</zabbix_export>
+"""
+
+YAML_EXPORT = """zabbix_export:
+  version: '6.0'
+  template_groups:
+    - uuid: g1
+      name: Templates
+  templates:
+    - uuid: abc
+      template: 'Linux by Zabbix'
+      name: 'Linux by Zabbix'
+      items:
+        - uuid: i1
+          name: CPU
+          key: system.cpu.load
+          history: 31d
+          preprocessing:
+            - type: MULTIPLIER
+              parameters:
+                - '8'
+        - uuid: i2
+          name: Name
+          key: system.uname
+          delay: 1h
+          value_type: CHAR
+          history: 7d
+      discovery_rules:
+        - name: fs
+          key: vfs.fs.discovery
+          item_prototypes:
+            - name: p
+              key: 'vfs.fs.size[{#FS},free]'
+    - uuid: def
+      template: T2
+      name: T2
+      items:
+        - uuid: i3
+          name: x
+          key: x
+          history: 7d
+          trends: 30d
+  graphs:
+    - name: g
+      graph_items:
+        - item:
+            host: T2
+            key: x
+"""
+
+EXPECTED = [
+    {
+        'templateid': 'abc',
+        'name': 'Linux by Zabbix',
+        'items': [
+            {'itemid': 'i1', 'name': 'CPU', 'key_': 'system.cpu.load', 'history': '31d', 'trends': '365d', 'delay': '1m'},
+            {'itemid': 'i2', 'name': 'Name', 'key_': 'system.uname', 'history': '7d', 'trends': '0', 'delay': '1h'}
+        ]
+    },
+    {
+        'templateid': 'def',
+        'name': 'T2',
+        'items': [
+            {'itemid': 'i3', 'name': 'x', 'key_': 'x', 'history': '7d', 'trends': '30d', 'delay': '1m'}
+        ]
+    }
+]
+
+@pytest.fixture
+def exports(tmp_path):
+    """El mismo export en los tres formatos"""
+    yaml_module = pytest.importorskip('yaml')
+    paths = {}
+
+    for extension, content in (('xml', XML_EXPORT), ('yaml', YAML_EXPORT)):
+        paths[extension] = tmp_path / f"export.{extension}"
+        paths[extension].write_text(content, encoding='utf-8')
+
+    paths['json'] = tmp_path / 'export.json'
+    paths['json'].write_text(json.dumps(yaml_module.safe_load(YAML_EXPORT)), encoding='utf-8')
+
+    return paths
+
+@pytest.mark.parametrize('extension', ['xml', 'yaml', 'json'])
+def test_export_formats_give_identical_templates(exports, extension):
+    assert list(iter_export_templates([str(exports[extension])])) == EXPECTED
+
+def test_unsupported_export_format(tmp_path):
+    path = tmp_path / 'export.txt'
+    path.write_text('', encoding='utf-8')
+
+    with pytest.raises(ValueError, match='no soportado'):
+        list(iter_export_templates([str(path)]))
+
+def test_same_template_in_two_exports_is_rejected(exports, capsys):
+    # Antes fallaba comparando diccionarios en el heap del top-K
+    assert analyze_export_files([str(exports['xml']), str(exports['json'])]) is None
+    assert 'aparece más de una vez' in capsys.readouterr().out
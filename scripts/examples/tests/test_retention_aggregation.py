@@ -0,0 +1,99 @@
+"""Tests de RetentionAggregator: combinar shards debe dar lo mismo que una pasada única"""
+
+import json
+
+import pytest
+
+from retention_aggregation import RetentionAggregator, estimate_item_bytes
+from template_scope import template_shard
+
+HISTORY_VALUES = ['7d', '31d', '90d', '1h', '']
+TRENDS_VALUES = ['30d', '365d', '0', '2w']
+
+def make_templates(count=40):
+    """Templates sintéticos con valores repetidos para forzar empates en el top-K"""
+    templates = []
+    for index in range(count):
+        items = [
+            {
+                'itemid': f"{index}-{position}",
+                'history': HISTORY_VALUES[(index + position) % len(HISTORY_VALUES)],
+                'trends': TRENDS_VALUES[(index * position) % len(TRENDS_VALUES)],
+                'delay': '1m' if position % 2 else '5m'
+            }
+            for position in range(index % 6)
+        ]
+        templates.append({
+            'templateid': str(10000 + index),
+            'name': f"Template {index}",
+            'hosts': str(index % 4),
+            'items': items
+        })
+    return templates
+
+def aggregate(templates, top_k=5):
+    aggregator = RetentionAggregator(top_k)
+    for template in templates:
+        aggregator.add_template(template)
+    return aggregator
+
+@pytest.mark.parametrize('shards', [2, 3, 7])
+def test_merged_shards_match_single_pass(shards):
+    templates = make_templates()
+    single = aggregate(templates)
+
+    merged = RetentionAggregator(5)
+    for index in range(shards):
+        part = aggregate([t for t in templates if template_shard(t['templateid'], shards) == index])
+        # Ida y vuelta por JSON, como los informes parciales que se combinan después
+        merged.merge(RetentionAggregator.from_dict(json.loads(json.dumps(part.to_dict()))))
+
+    assert merged.to_stats() == single.to_stats()
+
+def test_merge_rejects_overlapping_shards():
+    templates = make_templates()
+    first = aggregate(templates[:25])
+    second = aggregate(templates[20:])
+
+    with pytest.raises(ValueError, match='más de un shard'):
+        first.merge(second)
+
+def test_repeated_templateid_is_rejected():
+    aggregator = RetentionAggregator()
+    template = make_templates()[5]
+    aggregator.add_template(template)
+
+    with pytest.raises(ValueError, match='más de una vez'):
+        aggregator.add_template(dict(template))
+
+def test_equal_values_do_not_compare_template_stats():
+    aggregator = RetentionAggregator(top_k=2)
+    for index in range(5):
+        aggregator.add_template({
+            'templateid': str(index),
+            'name': f"T{index}",
+            'hosts': '3',
+            'items': [{'history': '31d', 'trends': '365d', 'delay': '1m'}]
+        })
+
+    top = aggregator.top_templates('problematic_items')
+    # Con el mismo valor desempata el templateid, mayor primero
+    assert [t['templateid'] for t in top] == ['4', '3']
+
+def test_top_k_must_be_positive():
+    with pytest.raises(ValueError):
+        RetentionAggregator(top_k=0)
+
+def test_estimated_bytes_scale_with_linked_hosts():
+    item = {'history': '31d', 'trends': '365d', 'delay': '1m'}
+    single_copy = estimate_item_bytes(31, 365, '1m')
+    aggregator = RetentionAggregator()
+
+    linked = aggregator.add_template({'templateid': '1', 'name': 'a', 'hosts': '4', 'items': [item]})
+    unlinked = aggregator.add_template({'templateid': '2', 'name': 'b', 'hosts': '0', 'items': [item]})
+    # Los exports no traen hosts: se cuenta una sola copia
+    exported = aggregator.add_template({'templateid': '3', 'name': 'c', 'items': [item]})
+
+    assert linked['estimated_bytes'] == 4 * single_copy
+    assert unlinked['estimated_bytes'] == 0
+    assert exported['estimated_bytes'] == single_copy
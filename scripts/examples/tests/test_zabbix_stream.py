@@ -0,0 +1,144 @@
+"""Tests del cliente JSON-RPC en streaming contra un servidor HTTP local"""
+
+import gzip
+import http.server
+import json
+import threading
+import zlib
+
+import pytest
+
+from zabbix_stream import ZabbixStreamClient, ZabbixStreamError
+
+pytest.importorskip('ijson')
+
+TEMPLATES = [
+    {
+        'templateid': '10001',
+        'name': 'Linux by Zabbix',
+        'items': [
+            {'itemid': '1', 'key_': 'system.cpu.load', 'history': '31d', 'trends': '365d'},
+            {'itemid': '2', 'key_': 'system.uname', 'history': '7d', 'trends': '0'}
+        ],
+        # selectHosts='count' puede llegar detrás de los items
+        'hosts': '12'
+    },
+    {'templateid': '10002', 'name': 'Vacío', 'items': [], 'hosts': '0'}
+]
+
+def encode(body, encoding):
+    """Comprime el cuerpo de la respuesta según el Content-Encoding"""
+    if encoding == 'gzip':
+        return gzip.compress(body)
+    if encoding == 'deflate':
+        return zlib.compress(body)
+    if encoding == 'raw-deflate':
+        compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        return compressor.compress(body) + compressor.flush()
+    return body
+
+@pytest.fixture
+def server():
+    """Servidor JSON-RPC local; state['result'] fija la respuesta"""
+    state = {'encoding': 'gzip', 'result': TEMPLATES, 'error': None, 'requests': []}
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers['Content-Length']))
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            request = json.loads(body)
+            state['requests'].append((request, dict(self.headers)))
+
+            if request['method'] == 'apiinfo.version':
+                response = {'jsonrpc': '2.0', 'result': '7.0.5', 'id': request['id']}
+            elif state['error']:
+                response = {'jsonrpc': '2.0', 'error': state['error'], 'id': request['id']}
+            else:
+                response = {'jsonrpc': '2.0', 'result': state['result'], 'id': request['id']}
+
+            encoding = state['encoding']
+            data = encode(json.dumps(response).encode('utf-8'), encoding)
+            self.send_response(200)
+            if encoding != 'identity':
+                self.send_header('Content-Encoding', 'deflate' if encoding == 'raw-deflate' else encoding)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    state['url'] = f"http://127.0.0.1:{httpd.server_address[1]}"
+
+    yield state
+
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.mark.parametrize('encoding', ['identity', 'gzip', 'deflate', 'raw-deflate'])
+def test_iter_templates_decodes_every_encoding(server, encoding):
+    server['encoding'] = encoding
+    client = ZabbixStreamClient(server['url'], 'token', api_version=7.0)
+
+    templates = []
+    for template in client.iter_templates(output=['templateid', 'name']):
+        items = list(template['items'])
+        templates.append(dict(template, items=items))
+
+    assert templates == TEMPLATES
+    assert client.stats['response_raw_bytes'] >= client.stats['response_bytes']
+
+@pytest.mark.parametrize('encoding', ['gzip', 'deflate', 'raw-deflate'])
+def test_call_decodes_compressed_responses(server, encoding):
+    server['encoding'] = encoding
+    client = ZabbixStreamClient(server['url'], 'token', api_version=7.0)
+
+    assert client.template.get(output=['name']) == TEMPLATES
+
+def test_hosts_after_items_is_read_once_items_are_consumed(server):
+    client = ZabbixStreamClient(server['url'], 'token', api_version=7.0)
+
+    template = next(client.iter_templates())
+    assert 'hosts' not in template
+
+    for _ in template['items']:
+        pass
+    assert template['hosts'] == '12'
+
+def test_unconsumed_items_are_skipped(server):
+    client = ZabbixStreamClient(server['url'], 'token', api_version=7.0)
+
+    names = [template['name'] for template in client.iter_templates()]
+
+    assert names == ['Linux by Zabbix', 'Vacío']
+
+def test_error_response_raises(server):
+    server['error'] = {'code': -32602, 'message': 'Invalid params.', 'data': 'Not authorized.'}
+    client = ZabbixStreamClient(server['url'], 'token', api_version=7.0)
+
+    with pytest.raises(ZabbixStreamError, match='Not authorized'):
+        client.template.get()
+    with pytest.raises(ZabbixStreamError, match='Invalid params'):
+        list(client.iter_templates())
+
+def test_api_version_selects_authentication(server):
+    client = ZabbixStreamClient(server['url'], 'token')
+
+    assert client.api_version() == 7.0
+    client.template.get()
+
+    version_request, version_headers = server['requests'][0]
+    request, headers = server['requests'][1]
+    assert 'auth' not in version_request and 'Authorization' not in version_headers
+    assert headers['Authorization'] == 'Bearer token' and 'auth' not in request
+
+def test_transfer_summary_reports_request_compression(server):
+    client = ZabbixStreamClient(server['url'], 'token', api_version=7.0, compress_requests=True)
+    client.item.get(itemids=[str(i) for i in range(500)])
+
+    assert client.stats['request_bytes'] < client.stats['request_raw_bytes']
+    assert client.transfer_summary().count('sin comprimir') == 2
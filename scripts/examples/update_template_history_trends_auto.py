@@ -4,11 +4,14 @@ Script automático para actualizar los valores de History y Trends en los templa
 para entornos de prueba locales.
 """
 
+import argparse
 import json
 import sys
 import os
-from zabbix_utils import ZabbixAPI
 from dotenv import load_dotenv
+from template_scope import add_scope_arguments, describe_scope, get_template_scope
+from item_verification import print_verification, verify_updated_items
+from zabbix_stream import ZabbixStreamClient
 
 # Cargar variables de entorno desde .env
 load_dotenv()
@@ -17,6 +20,9 @@ load_dotenv()
 ZABBIX_URL = os.getenv('ZABBIX_URL', 'http://localhost:8080')
 ZABBIX_TOKEN = os.getenv('ZABBIX_TOKEN')
 
+# Comprimir también las peticiones (el servidor web debe aceptar Content-Encoding: gzip)
+ZABBIX_COMPRESS_REQUESTS = os.getenv('ZABBIX_COMPRESS_REQUESTS', '').lower() in ('1', 'true', 'yes')
+
 # Valores recomendados para entornos de prueba
 NEW_HISTORY = "7d"   # 7 días en lugar de 31 días
 NEW_TRENDS = "30d"   # 30 días en lugar de 365 días
@@ -28,8 +34,8 @@ MAX_ITEMS_PER_TEMPLATE = 50   # Máximo 50 items por template
 def connect_to_zabbix():
     """Conecta a la API de Zabbix usando token"""
     try:
-        api = ZabbixAPI(url=ZABBIX_URL)
-        api.login(token=ZABBIX_TOKEN)
+        # Todo el tráfico del script pasa por este cliente (gzip/deflate y cuenta de bytes)
+        api = ZabbixStreamClient(ZABBIX_URL, ZABBIX_TOKEN, compress_requests=ZABBIX_COMPRESS_REQUESTS)
         print(f"✅ Conectado a Zabbix API versión: {api.api_version()}")
         return api
     except Exception as e:
@@ -59,57 +65,72 @@ def parse_time_to_days(time_str):
         except:
             return 0
 
-def get_top_problematic_templates(api):
-    """Obtiene los templates más problemáticos limitados"""
+def plan_template_items(template):
+    """Calcula los items de un template que necesitan actualización y sus nuevos valores"""
+    items_to_update = []
+    
+    for item in template.get('items', []):
+        # Los items heredados de otro template se cambian en su template padre
+        if item.get('templateid', '0') != '0':
+            continue
+        
+        history = item.get('history', '')
+        trends = item.get('trends', '')
+        
+        history_days = parse_time_to_days(history)
+        trends_days = parse_time_to_days(trends)
+        
+        # Solo items que realmente necesiten actualización
+        needs_history_update = history_days > 7
+        needs_trends_update = trends_days > 30
+        
+        if needs_history_update or needs_trends_update:
+            items_to_update.append({
+                'itemid': item['itemid'],
+                'name': item['name'],
+                'key_': item.get('key_', ''),
+                'delay': item.get('delay', ''),
+                'current_history': history,
+                'current_trends': trends,
+                'new_history': NEW_HISTORY if needs_history_update else history,
+                'new_trends': NEW_TRENDS if needs_trends_update else trends
+            })
+    
+    return items_to_update
+
+def get_top_problematic_templates(api, scope=None, max_templates=MAX_TEMPLATES_TO_UPDATE,
+                                  max_items=MAX_ITEMS_PER_TEMPLATE):
+    """Obtiene los templates más problemáticos limitados (None para no limitar)"""
     try:
-        # Obtener todos los templates con sus items
+        # Obtener los templates del alcance con sus items
         templates = api.template.get(
             output=['templateid', 'name'],
-            selectItems=['itemid', 'name', 'key_', 'history', 'trends']
+            selectItems=['itemid', 'name', 'key_', 'history', 'trends', 'delay', 'templateid'],
+            selectHosts='count',
+            **(scope or {})
         )
         
         templates_with_scores = []
         
         for template in templates:
-            items_to_update = []
-            
-            for item in template.get('items', []):
-                history = item.get('history', '')
-                trends = item.get('trends', '')
-                
-                history_days = parse_time_to_days(history)
-                trends_days = parse_time_to_days(trends)
-                
-                # Solo items que realmente necesiten actualización
-                needs_history_update = history_days > 7
-                needs_trends_update = trends_days > 30
-                
-                if needs_history_update or needs_trends_update:
-                    items_to_update.append({
-                        'itemid': item['itemid'],
-                        'name': item['name'],
-                        'key_': item.get('key_', ''),
-                        'current_history': history,
-                        'current_trends': trends,
-                        'new_history': NEW_HISTORY if needs_history_update else history,
-                        'new_trends': NEW_TRENDS if needs_trends_update else trends
-                    })
+            items_to_update = plan_template_items(template)
             
             if items_to_update:
                 # Limitar items por template
-                if len(items_to_update) > MAX_ITEMS_PER_TEMPLATE:
-                    items_to_update = items_to_update[:MAX_ITEMS_PER_TEMPLATE]
+                if max_items is not None and len(items_to_update) > max_items:
+                    items_to_update = items_to_update[:max_items]
                 
                 templates_with_scores.append({
                     'templateid': template['templateid'],
                     'name': template['name'],
+                    'hosts': int(template.get('hosts') or 0),
                     'items': items_to_update,
                     'score': len(items_to_update)
                 })
         
         # Ordenar por score (número de items problemáticos) y tomar solo los top
         templates_with_scores.sort(key=lambda x: x['score'], reverse=True)
-        return templates_with_scores[:MAX_TEMPLATES_TO_UPDATE]
+        return templates_with_scores[:max_templates]
         
     except Exception as e:
         print(f"❌ Error obteniendo templates: {e}")
@@ -149,6 +170,11 @@ def update_template_items(api, template):
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description='Actualiza History/Trends de los templates más problemáticos')
+    parser.add_argument('--no-verify', action='store_true', help='No verificar los items tras actualizar')
+    add_scope_arguments(parser)
+    args = parser.parse_args()
+    
     print("🔧 Actualizador Automático de History/Trends para Templates de Zabbix")
     print("=" * 70)
     
@@ -159,15 +185,22 @@ def main():
     print(f"🌐 URL: {ZABBIX_URL}")
     print(f"📅 Nuevos valores: History={NEW_HISTORY}, Trends={NEW_TRENDS}")
     print(f"🎯 Modo conservador: Máximo {MAX_TEMPLATES_TO_UPDATE} templates, {MAX_ITEMS_PER_TEMPLATE} items/template")
+    print(f"🎯 Alcance: {describe_scope(args)}")
     
     # Conectar a Zabbix
     api = connect_to_zabbix()
     if not api:
         sys.exit(1)
     
+    try:
+        scope = get_template_scope(api, args)
+    except Exception as e:
+        print(f"❌ Error resolviendo el alcance: {e}")
+        sys.exit(1)
+    
     # Obtener templates más problemáticos
     print(f"\n🔍 Buscando templates más problemáticos...")
-    templates_to_update = get_top_problematic_templates(api)
+    templates_to_update = get_top_problematic_templates(api, scope) if scope is not None else []
     
     if not templates_to_update:
         print("✅ No se encontraron templates que necesiten actualización")
@@ -196,14 +229,28 @@ def main():
     print(f"\n🎉 Actualización completada!")
     print(f"📊 Total de items actualizados: {total_updated}")
     print(f"❌ Total de errores: {total_errors}")
-    print(f"📈 Tasa de éxito: {(total_updated/(total_updated+total_errors)*100):.1f}%")
+    
+    # Verificar en Zabbix solo los items actualizados
+    verification = None
+    if not args.no_verify:
+        print(f"\n🔍 Verificando items actualizados...")
+        try:
+            verification = verify_updated_items(api, [item for t in templates_to_update for item in t['items']])
+            print_verification(verification)
+        except Exception as e:
+            print(f"❌ Error verificando items: {e}")
+    
+    if verification:
+        print(f"📈 Tasa de éxito (verificada): {(verification['verified']/verification['total']*100):.1f}%")
+    elif total_updated + total_errors:
+        print(f"📈 Tasa de éxito (sin verificar): {(total_updated/(total_updated+total_errors)*100):.1f}%")
     
     # Mostrar resumen de cambios
     print(f"\n📋 Resumen de cambios aplicados:")
     print(f"   History: {NEW_HISTORY} (antes hasta 31d)")
     print(f"   Trends:  {NEW_TRENDS} (antes hasta 365d)")
     print(f"\n💡 Esto debería reducir significativamente el uso de espacio en disco")
-    print(f"🔍 Puedes ejecutar el script de análisis nuevamente para verificar los cambios")
+    print(f"📡 Transferencia: {api.transfer_summary()}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Script para actualizar los valores de History y Trends en los templates de Zabbix
+usando configuration.export / configuration.import.
+
+En lugar de una llamada item.update por item, cada template se exporta, se
+reescriben localmente los campos history/trends de sus items y se vuelve a
+importar con una sola llamada configuration.import. El cambio de cada template
+es atómico desde el punto de vista de Zabbix.
+"""
+
+import argparse
+import json
+import sys
+import os
+from dotenv import load_dotenv
+from template_scope import add_scope_arguments, describe_scope, get_template_scope
+from item_verification import print_verification, verify_updated_items
+from zabbix_stream import ZabbixStreamClient
+
+# Cargar variables de entorno desde .env
+load_dotenv()
+
+# Configuración desde variables de entorno
+ZABBIX_URL = os.getenv('ZABBIX_URL', 'http://localhost:8080')
+ZABBIX_TOKEN = os.getenv('ZABBIX_TOKEN')
+
+# Comprimir también las peticiones (el servidor web debe aceptar Content-Encoding: gzip)
+ZABBIX_COMPRESS_REQUESTS = os.getenv('ZABBIX_COMPRESS_REQUESTS', '').lower() in ('1', 'true', 'yes')
+
+# Valores recomendados para entornos de prueba
+NEW_HISTORY = "7d"   # 7 días en lugar de 31 días
+NEW_TRENDS = "30d"   # 30 días en lugar de 365 días
+
+# Reglas de importación: solo se actualizan items existentes. Zabbix solo procesa
+# los items de templates que la importación crea o actualiza, así que el template
+# también debe actualizarse (sus campos vuelven tal cual vienen del export)
+IMPORT_RULES = {
+    'templates': {
+        'createMissing': False,
+        'updateExisting': True
+    },
+    'items': {
+        'createMissing': False,
+        'updateExisting': True,
+        'deleteMissing': False
+    }
+}
+
+def connect_to_zabbix():
+    """Conecta a la API de Zabbix usando token"""
+    try:
+        # Todo el tráfico del script pasa por este cliente (gzip/deflate y cuenta de bytes)
+        api = ZabbixStreamClient(ZABBIX_URL, ZABBIX_TOKEN, compress_requests=ZABBIX_COMPRESS_REQUESTS)
+        print(f"✅ Conectado a Zabbix API versión: {api.api_version()}")
+        return api
+    except Exception as e:
+        print(f"❌ Error conectando a Zabbix: {e}")
+        return None
+
+def parse_time_to_days(time_str):
+    """Convierte string de tiempo a días (ej: '31d' -> 31)"""
+    if not time_str or time_str == '0':
+        return 0
+
+    time_str = str(time_str).lower()
+
+    if time_str.endswith('d'):
+        return int(time_str[:-1])
+    elif time_str.endswith('w'):
+        return int(time_str[:-1]) * 7
+    elif time_str.endswith('m'):
+        return int(time_str[:-1]) * 30
+    elif time_str.endswith('y'):
+        return int(time_str[:-1]) * 365
+    elif time_str.endswith('h'):
+        return int(time_str[:-1]) / 24
+    else:
+        try:
+            return int(time_str)
+        except:
+            return 0
+
+def get_templates_with_long_history(api, scope=None):
+    """Obtiene templates que tienen history > 7d o trends > 30d"""
+    try:
+        # Obtener los templates del alcance con sus items
+        templates = api.template.get(
+            output=['templateid', 'name'],
+            selectItems=['itemid', 'name', 'key_', 'history', 'trends', 'templateid'],
+            **(scope or {})
+        )
+
+        templates_to_update = []
+
+        for template in templates:
+            items_to_update = []
+
+            for item in template.get('items', []):
+                # Los items heredados no están en el export de este template,
+                # se actualizan al importar su template padre
+                if item.get('templateid', '0') != '0':
+                    continue
+
+                history = item.get('history', '')
+                trends = item.get('trends', '')
+
+                history_days = parse_time_to_days(history)
+                trends_days = parse_time_to_days(trends)
+
+                if history_days > 7 or trends_days > 30:
+                    items_to_update.append({
+                        'itemid': item['itemid'],
+                        'name': item['name'],
+                        'key_': item.get('key_', ''),
+                        'current_history': history,
+                        'current_trends': trends,
+                        'new_history': NEW_HISTORY if history_days > 7 else history,
+                        'new_trends': NEW_TRENDS if trends_days > 30 else trends
+                    })
+
+            if items_to_update:
+                templates_to_update.append({
+                    'templateid': template['templateid'],
+                    'name': template['name'],
+                    'items': items_to_update
+                })
+
+        return templates_to_update
+
+    except Exception as e:
+        print(f"❌ Error obteniendo templates: {e}")
+        return []
+
+def rewrite_export_items(export, items):
+    """Reescribe history/trends de los items del export según las keys planificadas"""
+    items_by_key = {item['key_']: item for item in items}
+    rewritten = 0
+
+    for template in export.get('zabbix_export', {}).get('templates', []):
+        for exported_item in template.get('items', []):
+            item = items_by_key.get(exported_item.get('key'))
+            if not item:
+                continue
+
+            exported_item['history'] = item['new_history']
+            exported_item['trends'] = item['new_trends']
+            rewritten += 1
+
+    return rewritten
+
+def update_template_via_import(api, template):
+    """Actualiza los items de un template con un único configuration.import"""
+    print(f"\n📋 Actualizando template: {template['name']}")
+    print(f"   Items a actualizar: {len(template['items'])}")
+
+    try:
+        source = api.configuration.export(
+            format='json',
+            options={'templates': [template['templateid']]}
+        )
+        export = json.loads(source)
+
+        rewritten = rewrite_export_items(export, template['items'])
+        if rewritten != len(template['items']):
+            print(f"   ⚠️  Solo {rewritten}/{len(template['items'])} items encontrados en el export")
+
+        if not rewritten:
+            return 0, len(template['items'])
+
+        # "import" es palabra reservada en Python
+        getattr(api.configuration, 'import')(
+            format='json',
+            source=json.dumps(export),
+            rules=IMPORT_RULES
+        )
+
+        print(f"   ✅ Importado: {rewritten} items actualizados")
+        return rewritten, len(template['items']) - rewritten
+
+    except Exception as e:
+        print(f"   ❌ Error importando template {template['name']}: {e}")
+        return 0, len(template['items'])
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Actualiza History/Trends con configuration.import')
+    parser.add_argument('--yes', action='store_true', help='No pedir confirmación')
+    parser.add_argument('--no-verify', action='store_true', help='No verificar los items tras importar')
+    add_scope_arguments(parser)
+    args = parser.parse_args()
+
+    print("🔧 Actualizador de History/Trends por Importación para Templates de Zabbix")
+    print("=" * 70)
+
+    if not ZABBIX_TOKEN:
+        print("❌ Error: ZABBIX_TOKEN no está configurado")
+        sys.exit(1)
+
+    print(f"🌐 URL: {ZABBIX_URL}")
+    print(f"📅 Nuevos valores: History={NEW_HISTORY}, Trends={NEW_TRENDS}")
+    print(f"🎯 Alcance: {describe_scope(args)}")
+
+    # Conectar a Zabbix
+    api = connect_to_zabbix()
+    if not api:
+        sys.exit(1)
+
+    try:
+        scope = get_template_scope(api, args)
+    except Exception as e:
+        print(f"❌ Error resolviendo el alcance: {e}")
+        sys.exit(1)
+
+    # Obtener templates que necesitan actualización
+    print("\n🔍 Buscando templates con valores largos de History/Trends...")
+    templates_to_update = get_templates_with_long_history(api, scope) if scope is not None else []
+
+    if not templates_to_update:
+        print("✅ No se encontraron templates que necesiten actualización")
+        return
+
+    total_items = sum(len(t['items']) for t in templates_to_update)
+    print(f"📋 Se encontraron {len(templates_to_update)} templates que necesitan actualización")
+    print(f"📊 Total de items a actualizar: {total_items}")
+    print(f"📡 Llamadas configuration.import previstas: {len(templates_to_update)}")
+
+    if not args.yes:
+        print(f"\n⚠️  ¿Continuar con la actualización? (s/N): ", end="")
+        response = input().strip().lower()
+
+        if response not in ['s', 'sí', 'si', 'yes', 'y']:
+            print("❌ Operación cancelada")
+            return
+
+    # Actualizar templates
+    print(f"\n🚀 Iniciando actualización...")
+    total_updated = 0
+    total_errors = 0
+
+    for i, template in enumerate(templates_to_update, 1):
+        print(f"\n[{i}/{len(templates_to_update)}] Procesando...")
+        updated, errors = update_template_via_import(api, template)
+        total_updated += updated
+        total_errors += errors
+
+    print(f"\n🎉 Actualización completada!")
+    print(f"📊 Total de items actualizados: {total_updated}/{total_items}")
+    print(f"❌ Total de errores: {total_errors}")
+
+    # Verificar en Zabbix solo los items actualizados
+    verification = None
+    if not args.no_verify:
+        print(f"\n🔍 Verificando items actualizados...")
+        try:
+            verification = verify_updated_items(api, [item for t in templates_to_update for item in t['items']])
+            print_verification(verification)
+        except Exception as e:
+            print(f"❌ Error verificando items: {e}")
+
+    if verification:
+        print(f"📈 Tasa de éxito (verificada): {(verification['verified']/verification['total']*100):.1f}%")
+
+    print(f"📡 Transferencia: {api.transfer_summary()}")
+
+if __name__ == "__main__":
+    main()
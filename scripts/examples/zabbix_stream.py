@@ -0,0 +1,294 @@
+"""
+Cliente JSON-RPC mínimo para Zabbix que decodifica las respuestas en streaming.
+
+En lugar de decodificar toda la respuesta de template.get con json.loads, los
+eventos de ijson se van leyendo del cuerpo HTTP según llegan y se entregan
+item a item. La memoria usada es proporcional a un item, no a la respuesta, y el
+análisis avanza mientras se siguen recibiendo datos.
+
+Las peticiones negocian gzip/deflate con el servidor y, si orjson está
+instalado, se usa para codificar/decodificar JSON. El cliente lleva la cuenta
+de los bytes enviados y recibidos para medir el ahorro en enlaces WAN.
+
+También sirve como cliente general (client.item.update(...), client.api_version()),
+así los scripts envían todo su tráfico por aquí y no solo template.get.
+"""
+
+import gzip
+import itertools
+import json
+import threading
+import urllib.request
+import zlib
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Eventos de ijson que contienen un valor escalar
+SCALAR_EVENTS = ('string', 'number', 'boolean', 'null')
+
+TEMPLATE_PREFIX = 'result.item'
+ITEMS_PREFIX = 'result.item.items'
+ITEM_PREFIX = 'result.item.items.item'
+
+# Tamaño de bloque al leer y descomprimir respuestas
+READ_CHUNK_SIZE = 64 * 1024
+
+def json_dumps(data):
+    """Codifica a JSON en bytes, con orjson si está disponible"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+def json_loads(data):
+    """Decodifica JSON desde bytes, con orjson si está disponible"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def format_bytes(count):
+    """Formatea un número de bytes de forma legible"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if count < 1024 or unit == 'GB':
+            return f"{count:.1f} {unit}"
+        count /= 1024
+
+def deflate_window_bits(data):
+    """Devuelve wbits para 'deflate': con cabecera zlib (RFC 1950) o deflate crudo"""
+    # Algunos servidores envían deflate sin la cabecera zlib de dos bytes
+    if len(data) >= 2 and data[0] & 0x0f == 8 and (data[0] << 8 | data[1]) % 31 == 0:
+        return zlib.MAX_WBITS
+    return -zlib.MAX_WBITS
+
+class ZabbixStreamError(Exception):
+    """Error devuelto por la API de Zabbix en una respuesta en streaming"""
+
+class DecodingReader:
+    """Envuelve una respuesta HTTP, la descomprime al vuelo y cuenta los bytes"""
+
+    def __init__(self, response, encoding, on_read):
+        self.response = response
+        self.on_read = on_read
+        self.decompressor = None
+        self.buffer = b''
+
+        # El decompresor de deflate se crea con el primer bloque, según su cabecera
+        self.encoding = encoding
+
+        if encoding == 'gzip':
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def read(self, size=-1):
+        """Devuelve hasta size bytes ya descomprimidos"""
+        while size < 0 or len(self.buffer) < size:
+            chunk = self.response.read(READ_CHUNK_SIZE)
+            if chunk and self.encoding == 'deflate' and self.decompressor is None:
+                self.decompressor = zlib.decompressobj(deflate_window_bits(chunk))
+            if not chunk:
+                if self.decompressor is not None:
+                    decoded = self.decompressor.flush()
+                    self.on_read(0, len(decoded))
+                    self.buffer += decoded
+                    self.decompressor = None
+                break
+
+            decoded = self.decompressor.decompress(chunk) if self.decompressor else chunk
+            self.on_read(len(chunk), len(decoded))
+            self.buffer += decoded
+
+        if size < 0:
+            data, self.buffer = self.buffer, b''
+        else:
+            data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+class ZabbixAPIObject:
+    """Permite llamar a los métodos de la API como client.item.get(...)"""
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def __getattr__(self, method):
+        return lambda **params: self.client.call(f"{self.name}.{method}", params)
+
+class ZabbixStreamClient:
+    """Cliente JSON-RPC que lee las respuestas de la API de forma incremental"""
+
+    def __init__(self, url, token, api_version=None, timeout=300, compress_requests=False):
+        self.url = url if url.endswith('api_jsonrpc.php') else url.rstrip('/') + '/api_jsonrpc.php'
+        self.token = token
+        self.timeout = timeout
+        # Comprimir el cuerpo de las peticiones requiere soporte en el servidor web
+        self.compress_requests = compress_requests
+        self.version = api_version
+        # Desde Zabbix 6.4 el token va en la cabecera Authorization
+        self.use_auth_header = api_version is None or api_version >= 6.4
+        self.request_ids = itertools.count(1)
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'request_bytes': 0,
+            'request_raw_bytes': 0,
+            'response_bytes': 0,
+            'response_raw_bytes': 0
+        }
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return ZabbixAPIObject(self, name)
+
+    def _count_response(self, wire_bytes, raw_bytes):
+        """Acumula los bytes recibidos (en la red y descomprimidos)"""
+        with self.stats_lock:
+            self.stats['response_bytes'] += wire_bytes
+            self.stats['response_raw_bytes'] += raw_bytes
+
+    def _open(self, method, params, auth=True):
+        """Envía la petición y devuelve la respuesta descomprimida sin leerla"""
+        body = {'jsonrpc': '2.0', 'method': method, 'params': params, 'id': next(self.request_ids)}
+        headers = {
+            'Content-Type': 'application/json-rpc',
+            'Accept-Encoding': 'gzip, deflate'
+        }
+
+        if auth and self.use_auth_header:
+            headers['Authorization'] = f"Bearer {self.token}"
+        elif auth:
+            body['auth'] = self.token
+
+        raw = json_dumps(body)
+        data = raw
+        if self.compress_requests:
+            data = gzip.compress(raw)
+            headers['Content-Encoding'] = 'gzip'
+
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['request_bytes'] += len(data)
+            self.stats['request_raw_bytes'] += len(raw)
+
+        request = urllib.request.Request(self.url, data=data, headers=headers, method='POST')
+        response = urllib.request.urlopen(request, timeout=self.timeout)
+        encoding = response.headers.get('Content-Encoding', '').lower()
+
+        return response, DecodingReader(response, encoding, self._count_response)
+
+    def call(self, method, params, auth=True):
+        """Ejecuta un método de la API y devuelve su resultado completo"""
+        response, reader = self._open(method, params, auth)
+
+        with response:
+            data = json_loads(reader.read())
+
+        if 'error' in data:
+            error = data['error']
+            raise ZabbixStreamError(f"{error.get('message')} {error.get('data', '')}".strip())
+
+        return data['result']
+
+    def api_version(self):
+        """Devuelve la versión de la API (ej: 7.0) y ajusta cómo se envía el token"""
+        if self.version is None:
+            # apiinfo.version no admite autenticación
+            version = self.call('apiinfo.version', {}, auth=False)
+            self.version = float('.'.join(version.split('.')[:2]))
+            self.use_auth_header = self.version >= 6.4
+        return self.version
+
+    def transfer_summary(self):
+        """Resumen legible de los bytes transferidos"""
+        stats = self.stats
+        sent = format_bytes(stats['request_bytes'])
+        received = format_bytes(stats['response_bytes'])
+
+        if stats['request_raw_bytes'] != stats['request_bytes']:
+            ratio = stats['request_raw_bytes'] / max(stats['request_bytes'], 1)
+            sent += f" ({format_bytes(stats['request_raw_bytes'])} sin comprimir, x{ratio:.1f})"
+        if stats['response_raw_bytes'] != stats['response_bytes']:
+            ratio = stats['response_raw_bytes'] / max(stats['response_bytes'], 1)
+            received += f" ({format_bytes(stats['response_raw_bytes'])} sin comprimir, x{ratio:.1f})"
+
+        return f"{stats['requests']} peticiones, enviado {sent}, recibido {received}"
+
+    def iter_templates(self, **params):
+        """Ejecuta template.get y devuelve los templates con 'items' como generador
+
+        Los items de cada template deben consumirse antes de pasar al siguiente
+        template; si no se consumen, se descartan.
+        """
+        if ijson is None:
+            raise RuntimeError("ijson no está instalado, necesario para el modo streaming")
+
+        response, reader = self._open('template.get', params)
+
+        with response:
+            events = ijson.parse(reader)
+            error = {}
+
+            for prefix, event, value in events:
+                if prefix.startswith('error.') and event in SCALAR_EVENTS:
+                    error[prefix[len('error.'):]] = value
+                elif prefix == 'error' and event == 'end_map':
+                    raise ZabbixStreamError(f"{error.get('message')} {error.get('data', '')}".strip())
+                elif prefix == TEMPLATE_PREFIX and event == 'start_map':
+                    template = self._read_template_header(events)
+                    yield template
+
+                    # Descartar los items que el consumidor no haya leído
+                    for _ in template['items']:
+                        pass
+
+    def _read_template_header(self, events):
+        """Lee los campos del template hasta el inicio de su lista de items"""
+        template = {}
+
+        for prefix, event, value in events:
+            if prefix == ITEMS_PREFIX and event == 'start_array':
+                template['items'] = self._iter_items(events, template)
+                return template
+            if prefix == TEMPLATE_PREFIX and event == 'end_map':
+                template['items'] = iter(())
+                return template
+            if event in SCALAR_EVENTS and prefix.count('.') == 2:
+                template[prefix[len(TEMPLATE_PREFIX) + 1:]] = value
+
+        raise ZabbixStreamError("Respuesta de template.get incompleta")
+
+    def _iter_items(self, events, template):
+        """Genera los items del template actual según se leen del stream
+
+        Al terminar los items se leen también los campos del template que vienen
+        detrás (ej: 'hosts' con selectHosts), así el template está completo en
+        cuanto se agotan sus items.
+        """
+        item = None
+
+        for prefix, event, value in events:
+            if prefix == ITEMS_PREFIX and event == 'end_array':
+                self._read_template_trailer(events, template)
+                return
+            if prefix == ITEM_PREFIX:
+                if event == 'start_map':
+                    item = {}
+                elif event == 'end_map':
+                    yield item
+                    item = None
+            elif item is not None and event in SCALAR_EVENTS and prefix.count('.') == 4:
+                item[prefix[len(ITEM_PREFIX) + 1:]] = value
+
+    def _read_template_trailer(self, events, template):
+        """Lee los campos del template posteriores a su lista de items"""
+        for prefix, event, value in events:
+            if prefix == TEMPLATE_PREFIX and event == 'end_map':
+                return
+            if event in SCALAR_EVENTS and prefix.count('.') == 2:
+                template[prefix[len(TEMPLATE_PREFIX) + 1:]] = value
@@ -0,0 +1,112 @@
+<?php
+
+use App\Jobs\Zabbix\OptimizeTemplatesJob;
+use App\Models\BackgroundJob;
+use App\Models\ZabbixConnection;
+use App\Models\ZabbixTemplate;
+use Illuminate\Support\Facades\Queue;
+
+uses()->group('feature', 'commands');
+
+test('optimize templates command queues one job per shard', function () {
+    Queue::fake();
+
+    $connection = ZabbixConnection::factory()->active()->create(['name' => 'Test Connection']);
+    ZabbixTemplate::factory()->needsOptimization()->count(3)->create([
+        'zabbix_connection_id' => $connection->id,
+        'template_type' => 'custom',
+    ]);
+
+    $this->artisan('zabbix:optimize:templates', [
+        'connection' => $connection->name,
+        '--all' => true,
+        '--queue' => true,
+        '--shards' => 3,
+    ])
+        ->expectsOutput('✓ 3 optimization jobs queued successfully!')
+        ->assertExitCode(0);
+
+    Queue::assertPushed(OptimizeTemplatesJob::class, 3);
+
+    $parent = BackgroundJob::where('job_type', 'optimize_all_templates_sharded')->first();
+    expect($parent)->not->toBeNull()
+        ->and($parent->parameters['shard_count'])->toBe(3);
+
+    foreach (range(0, 2) as $shard) {
+        Queue::assertPushed(
+            OptimizeTemplatesJob::class,
+            fn (OptimizeTemplatesJob $job): bool => $job->getShardIndex() === $shard && $job->getShardCount() === 3
+        );
+    }
+});
+
+test('optimize templates command queues a single unsharded job by default', function () {
+    Queue::fake();
+
+    $connection = ZabbixConnection::factory()->active()->create(['name' => 'Test Connection']);
+    ZabbixTemplate::factory()->needsOptimization()->create([
+        'zabbix_connection_id' => $connection->id,
+        'template_type' => 'custom',
+    ]);
+
+    $this->artisan('zabbix:optimize:templates', [
+        'connection' => $connection->name,
+        '--all' => true,
+        '--queue' => true,
+    ])
+        ->expectsOutput('✓ Optimization job queued successfully!')
+        ->assertExitCode(0);
+
+    Queue::assertPushed(OptimizeTemplatesJob::class, 1);
+    Queue::assertPushed(OptimizeTemplatesJob::class, fn (OptimizeTemplatesJob $job): bool => $job->getShardIndex() === null);
+});
+
+test('optimize templates command rejects shards with auto optimization', function () {
+    Queue::fake();
+
+    $connection = ZabbixConnection::factory()->active()->create(['name' => 'Test Connection']);
+
+    $this->artisan('zabbix:optimize:templates', [
+        'connection' => $connection->name,
+        '--all' => true,
+        '--auto' => true,
+        '--queue' => true,
+        '--shards' => 2,
+    ])
+        ->expectsOutput('The --shards option cannot be combined with --auto.')
+        ->assertExitCode(1);
+
+    Queue::assertNothingPushed();
+});
+
+test('optimize templates command rejects shards without all and queue', function (array $options) {
+    Queue::fake();
+
+    $connection = ZabbixConnection::factory()->active()->create(['name' => 'Test Connection']);
+
+    $this->artisan('zabbix:optimize:templates', ['connection' => $connection->name, '--shards' => 2] + $options)
+        ->expectsOutput('The --shards option requires --all and --queue.')
+        ->assertExitCode(1);
+
+    Queue::assertNothingPushed();
+})->with([
+    'without queue' => [['--all' => true]],
+    'without all' => [['--queue' => true]],
+]);
+
+test('optimize templates command rejects non-positive shard counts', function (string $shards) {
+    Queue::fake();
+
+    $connection = ZabbixConnection::factory()->active()->create(['name' => 'Test Connection']);
+
+    $this->artisan('zabbix:optimize:templates', [
+        'connection' => $connection->name,
+        '--all' => true,
+        '--queue' => true,
+        '--shards' => $shards,
+    ])
+        ->expectsOutput('The --shards option must be a positive integer.')
+        ->assertExitCode(1);
+
+    Queue::assertNothingPushed();
+})->with(['0', '-2', 'abc']);
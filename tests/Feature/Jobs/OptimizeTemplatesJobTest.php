@@ -0,0 +1,87 @@
+<?php
+
+use App\Jobs\Zabbix\OptimizeTemplatesJob;
+use App\Models\BackgroundJob;
+use App\Models\ZabbixConnection;
+use App\Models\ZabbixTemplate;
+
+uses()->group('feature', 'jobs');
+
+it('assigns every template to exactly one shard', function () {
+    $connection = ZabbixConnection::factory()->create();
+    $templates = ZabbixTemplate::factory()->needsOptimization()->count(50)->create([
+        'zabbix_connection_id' => $connection->id,
+    ]);
+
+    $shardCount = 4;
+    $jobs = collect(range(0, $shardCount - 1))
+        ->map(fn (int $shard) => new OptimizeTemplatesJob($connection, null, false, $shard, $shardCount));
+
+    foreach ($templates as $template) {
+        $owners = $jobs->filter(fn (OptimizeTemplatesJob $job): bool => $job->belongsToShard($template));
+
+        expect($owners)->toHaveCount(1);
+    }
+});
+
+it('includes every template when the job is not sharded', function () {
+    $connection = ZabbixConnection::factory()->create();
+    $template = ZabbixTemplate::factory()->needsOptimization()->create([
+        'zabbix_connection_id' => $connection->id,
+    ]);
+
+    $job = new OptimizeTemplatesJob($connection);
+
+    expect($job->belongsToShard($template))->toBeTrue()
+        ->and($job->getShardIndex())->toBeNull()
+        ->and($job->getShardCount())->toBe(1);
+});
+
+it('combines shard results into the parent background job', function () {
+    $connection = ZabbixConnection::factory()->create();
+    ZabbixTemplate::factory()->optimized()->count(3)->create([
+        'zabbix_connection_id' => $connection->id,
+    ]);
+
+    $parent = BackgroundJob::create([
+        'job_type' => 'optimize_all_templates_sharded',
+        'zabbix_connection_id' => $connection->id,
+        'parameters' => ['shard_count' => 2],
+        'status' => 'pending',
+    ]);
+
+    (new OptimizeTemplatesJob($connection, null, false, 0, 2, $parent->id))->handle();
+
+    $parent->refresh();
+    expect($parent->status)->toBe('running')
+        ->and($parent->result_data['shards_reported'])->toBe(1);
+
+    // A retried shard replaces its own result instead of counting twice
+    (new OptimizeTemplatesJob($connection, null, false, 0, 2, $parent->id))->handle();
+    (new OptimizeTemplatesJob($connection, null, false, 1, 2, $parent->id))->handle();
+
+    $parent->refresh();
+    expect($parent->status)->toBe('completed')
+        ->and($parent->result_data['shards_reported'])->toBe(2)
+        ->and($parent->result_data['failed_shards'])->toBe(0)
+        ->and($parent->result_data['total_templates'])->toBe(0);
+});
+
+it('marks the parent job as failed when a shard fails permanently', function () {
+    $connection = ZabbixConnection::factory()->create();
+
+    $parent = BackgroundJob::create([
+        'job_type' => 'optimize_all_templates_sharded',
+        'zabbix_connection_id' => $connection->id,
+        'parameters' => ['shard_count' => 2],
+        'status' => 'pending',
+    ]);
+
+    (new OptimizeTemplatesJob($connection, null, false, 0, 2, $parent->id))->handle();
+    (new OptimizeTemplatesJob($connection, null, false, 1, 2, $parent->id))->failed(new Exception('boom'));
+
+    $parent->refresh();
+    expect($parent->status)->toBe('failed')
+        ->and($parent->error_message)->toBe('1 of 2 shards failed')
+        ->and($parent->result_data['shards']['1']['error'])->toBe('boom');
+});